@@ -5,37 +5,21 @@ if not DIR in path:
 
 import time
 import thumby
-import random
 
 import global_store
 from game import GameState
-from ui.screens import TitleScreen, MainScreen
-from actions import PendingAction
-from systems import Sound
+from rng import Streams
+from ui.screens import TitleScreen
+from loop import MainLoop
+from recorder import Recorder
 
 thumby.saveData.setName("Threk")
+Recorder.load_setting()
 
-thumby.display.setFPS(30)
-random.seed(time.ticks_us())
+MainLoop.set_fps(30)
+seed = time.ticks_us()
+Streams.seed(seed)
 global_store.game_state = GameState()
-global_store.game_state.change_screen(TitleScreen)
+global_store.game_state.reset_screen(TitleScreen)
 
-global_store.current_time = time.ticks_ms()
-last_time = global_store.current_time
-
-while(1):
-    gs = global_store.game_state
-
-    global_store.current_time = time.ticks_ms()
-    global_store.delta = time.ticks_diff(global_store.current_time, last_time)
-    last_time = global_store.current_time
-
-    if PendingAction.queue and type(gs.screen) == MainScreen:
-        PendingAction.process(global_store.delta)
-    else:
-        gs.screen.process()
-    gs.screen.draw()
-
-    thumby.display.update()
-
-    Sound.process(global_store.delta)
+MainLoop.run(seed)
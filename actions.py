@@ -1,59 +1,99 @@
-import math
-import random
-
 import global_store
 import sprites
 from constants import Objects
-from systems import Sound, Message
+from rng import Streams
+from tables import Tables, COURSES, TORPEDO_SPREAD, course_index
+from systems import Sound, Message, Timeline
 from ui.screens import MainScreen
 from utils import *
 
 
 class PendingAction:
-    max_wait = 200
     queue = []
-    wait = 0
+    now = 0
+
+    @classmethod
+    def add(cls, action, after=None):
+        action.after = after
+        action.finished = False
+        action.last_run = cls.now
+        cls.schedule(action, cls.now)
+
+    @classmethod
+    def schedule(cls, action, deadline):
+        action.deadline = deadline
+        idx = len(cls.queue)
+        while idx and cls.queue[idx - 1].deadline > deadline:
+            idx -= 1
+        cls.queue.insert(idx, action)
+
+    @classmethod
+    def is_blocked(cls, action):
+        if action.after:
+            for dependency in action.after:
+                if not dependency.finished:
+                    return True
+        return False
 
     @classmethod
-    def process(cls, delta):
-        if cls.wait:
-            cls.wait -= delta
-            if cls.wait > 0:
-                return
+    def next_ready(cls):
+        for action in cls.queue:
+            if not cls.is_blocked(action):
+                return action
 
-        cls.wait = cls.max_wait
-        action = cls.queue[0]
-        if not action.process(delta):
-            cls.queue.pop(0)
+    @classmethod
+    def resolve(cls):
+        cls.now = 0
+        Timeline.start()
+        while cls.queue:
+            action = cls.next_ready()
+            if action is None:
+                cls.queue.clear()
+                break
+
+            if action.deadline > cls.now:
+                cls.now = action.deadline
+                Timeline.now = cls.now
+
+            cls.queue.remove(action)
+            elapsed = cls.now - action.last_run
+            action.last_run = cls.now
+            if action.process(elapsed):
+                cls.schedule(action, cls.now + action.step)
+            else:
+                action.finished = True
+        Timeline.stop()
 
 
 class PlayerMovement:
+    step = 200
+
     @global_store.add_game_state
     def __init__(self, gs, direction, distance):
-        PendingAction.queue.append(self)
+        PendingAction.add(self)
 
         self.last_quadrant_x = gs.player_quadrant_x
         self.last_quadrant_y = gs.player_quadrant_y
-        angle = direction_to_angle(direction)
         self.x = gs.player_quadrant_x * 8 + gs.player_x
         self.y = gs.player_quadrant_y * 8 + gs.player_y
-        dx = distance * math.cos(angle)
-        dy = distance * math.sin(angle)
+        self.start_x = self.x
+        self.start_y = self.y
 
         self.last_sector_x = gs.player_x
         self.last_sector_y = gs.player_y
-        self.path = bresenham(self.x, self.y, round(self.x + dx), round(self.y + dy))
+        self.path = Tables.warp_path(course_index(direction), distance)
+        self.position = 0
 
         self.obstacle_encoutered = False
 
     @global_store.add_game_state
     def move_inside_quadrant(self, gs):
-        try:
-            point = next(self.path)
-        except StopIteration:
+        if self.position >= len(self.path):
             return False
 
-        self.x, self.y = point
+        self.x = self.start_x + self.path[self.position]
+        self.y = self.start_y + self.path[self.position + 1]
+        self.position += 2
         quad_x = int(round(self.x)) // 8
         quad_y = int(round(self.y)) // 8
 
@@ -61,7 +101,7 @@ class PlayerMovement:
             sector_x = int(round(self.x)) % 8
             sector_y = int(round(self.y)) % 8
 
-            if gs.current_quadrant.get(sector_x, sector_y) != Objects.NOTHINGNESS:
+            if not gs.current_quadrant.is_free(sector_x, sector_y):
                 gs.player_x = self.last_sector_x
                 gs.player_y = self.last_sector_y
                 gs.current_quadrant.set(gs.player_x, gs.player_y, Objects.PLAYER)
@@ -89,16 +129,16 @@ class PlayerMovement:
             if self.x < 0:
                 galaxy_edge_encountered = True
                 self.x = 0
-            elif self.x > 8 * gs.quadrants_w - 1:
+            elif self.x > 8 * gs.galaxy.w - 1:
                 galaxy_edge_encountered = True
-                self.x = 8 * gs.quadrants_w - 1
+                self.x = 8 * gs.galaxy.w - 1
 
             if self.y < 0:
                 galaxy_edge_encountered = True
                 self.y = 0
-            elif self.y > 8 * gs.quadrants_h - 1:
+            elif self.y > 8 * gs.galaxy.h - 1:
                 galaxy_edge_encountered = True
-                self.y = 8 * gs.quadrants_h - 1
+                self.y = 8 * gs.galaxy.h - 1
 
             if galaxy_edge_encountered:
                 Message.show("Galaxy edge\nencountered")
@@ -114,9 +154,10 @@ class PlayerMovement:
 
                 gs.player_quadrant_x = quad_x
                 gs.player_quadrant_y = quad_y
-                gs.current_quadrant.map.clear()
+                gs.current_quadrant.store(gs.klingons)
+                gs.current_quadrant.map = None
                 gs.klingons.clear()
-                gs.current_quadrant = gs.quadrants[quad_y * gs.quadrants_w + quad_x]
+                gs.current_quadrant = gs.galaxy.get(quad_x, quad_y)
                 gs.current_quadrant.generate_map()
                 gs.current_quadrant.scanned = True
             else:
@@ -147,19 +188,21 @@ class PlayerMovement:
 
 
 class TorpedoMovement:
+    step = 200
+
     @global_store.add_game_state
     def __init__(self, gs, direction):
-        PendingAction.queue.append(self)
+        PendingAction.add(self)
 
-        angle = direction_to_angle(direction)
-        angle += ((1.0 - 2.0 * random.random()) * math.pi * 2.0) * 0.03
+        spread = int(round((1.0 - 2.0 * Streams.combat.random()) * TORPEDO_SPREAD))
         self.x = gs.player_x
         self.y = gs.player_y
         self.last_x = self.x
         self.last_y = self.y
-        self.path = bresenham(self.x, self.y, self.x + math.cos(angle) * 11.3, self.y + math.sin(angle) * 11.3)
+        self.path = Tables.torpedo_path(self.y * 8 + self.x, (course_index(direction) + spread) % COURSES)
+        self.position = 0
         self.sprite = [blit, [sprites.torpedo, self.x, self.y]]
-        MainScreen.additional_draws.append(self.sprite)
+        Timeline.call(MainScreen.add_draw, self.sprite)
 
 
     @global_store.add_game_state
@@ -167,28 +210,24 @@ class TorpedoMovement:
         torpedo_hit = False
         klingon_hit = False
 
-        try:
-            point = next(self.path)
-            x, y = point
-        except StopIteration:
-            point = None
+        if self.position < len(self.path):
+            cell = self.path[self.position]
+            self.position += 1
+            x = cell % 8
+            y = cell // 8
+            Timeline.call(MainScreen.move_sprite, self.sprite, x, y)
 
-        if point and not torpedo_hit and x >= 0 and y >= 0 and x < 8 and y < 8:
-            self.sprite[1][1] = x
-            self.sprite[1][2] = y
-
-            for klingon in gs.klingons:
-                if klingon.x == x and klingon.y == y:
-                    gs.destroy_klingon(klingon)
-                    torpedo_hit = True
-                    klingon_hit = True
-                    break
+            klingon = gs.current_quadrant.entity(x, y)
+            if klingon:
+                gs.destroy_klingon(klingon)
+                torpedo_hit = True
+                klingon_hit = True
 
             if not torpedo_hit:
                 obj = gs.current_quadrant.get(x, y)
                 if obj == Objects.STARBASE:
                     gs.current_quadrant.starbase = False
-                    gs.current_quadrant.set(x, y, Objects.NOTHINGNESS)
+                    gs.current_quadrant.destroy(x, y)
                     gs.starbases_left -= 1
                     torpedo_hit = True
 
@@ -199,79 +238,97 @@ class TorpedoMovement:
                 return True
 
         if not klingon_hit:
-            Sound.play(Sound.MISS)
-        MainScreen.additional_draws.remove(self.sprite)
+            Timeline.call(Sound.play, Sound.MISS)
+        Timeline.call(MainScreen.remove_draw, self.sprite)
         if gs.klingons:
             gs.generate_klingon_attack()
 
 
-class PhaserShotPlayer:
-    max_duration = 100
+def beam_overlay(klingons):
+    gs = global_store.game_state
+    x = gs.player_x * 5 + 2
+    y = gs.player_y * 5 + 2
+    lines = bytearray(4 * len(klingons))
+    for idx, klingon in enumerate(klingons):
+        lines[idx * 4] = x
+        lines[idx * 4 + 1] = y
+        lines[idx * 4 + 2] = klingon.x * 5 + 2
+        lines[idx * 4 + 3] = klingon.y * 5 + 2
+    return [draw_lines, [lines]]
 
-    def __init__(self, klingon, damage):
-        PendingAction.queue.append(self)
 
-        self.duration = self.max_duration
-        self.damage = damage
-        self.klingon = klingon
-        self.beam = [
-            thumby.display.drawLine, [
-                global_store.game_state.player_x * 5 + 2,
-                global_store.game_state.player_y * 5 + 2,
-                klingon.x * 5 + 2,
-                klingon.y * 5 + 2, 1
-            ]]
+class PlayerVolley:
+    step = 100
 
-    def process(self, delta):
-        if self.duration == self.max_duration:
-            MainScreen.additional_draws.append(self.beam)
-            Sound.play(Sound.PHASER)
-        self.duration -= delta
-        if self.duration > 0:
+    def __init__(self, klingons, damages):
+        PendingAction.add(self)
+
+        self.fired = False
+        self.klingons = klingons
+        self.damages = damages
+        self.beam = beam_overlay(klingons)
+
+    @global_store.add_game_state
+    def process(self, gs, delta):
+        if not self.fired:
+            self.fired = True
+            Timeline.call(MainScreen.add_draw, self.beam)
+            Timeline.call(Sound.play, Sound.PHASER)
             return True
 
-        MainScreen.additional_draws.remove(self.beam)
-        self.klingon.shields -= self.damage
+        Timeline.call(MainScreen.remove_draw, self.beam)
+        destroyed = 0
+        for klingon, damage in zip(self.klingons, self.damages):
+            klingon.shields -= damage
+            if klingon.shields <= 0:
+                destroyed += 1
+                gs.destroy_klingon(klingon, False)
+                if gs.over:
+                    return
+
+        if destroyed:
+            Timeline.call(Sound.play, Sound.EXPLOSION)
 
-        if self.klingon.shields <= 0:
-            global_store.game_state.destroy_klingon(self.klingon)
+        if len(self.klingons) > 1:
+            Message.show("Volley: {}\nDamage: {}\nKilled: {}".format(
+                len(self.klingons), sum(self.damages), destroyed
+            ))
+        elif destroyed:
+            Message.show("Klingon\ndestroyed")
         else:
             Message.show("Attack\nDamage: {}\nShield: {}".format(
-                self.damage, self.klingon.shields
+                self.damages[0], self.klingons[0].shields
             ))
 
 
-class PhaserShotKlingon:
-    max_duration = 100
+class KlingonVolley:
+    step = 100
 
-    def __init__(self, klingon, damage):
-        PendingAction.queue.append(self)
+    def __init__(self, klingons, damages):
+        PendingAction.add(self)
 
-        self.duration = self.max_duration
-        self.damage = damage
-        self.klingon = klingon
-        self.beam = [
-            thumby.display.drawLine, [
-                global_store.game_state.player_x * 5 + 2,
-                global_store.game_state.player_y * 5 + 2,
-                klingon.x * 5 + 2,
-                klingon.y * 5 + 2,
-                1
-            ]]
+        self.fired = False
+        self.klingons = klingons
+        self.damages = damages
+        self.beam = beam_overlay(klingons)
 
     @global_store.add_game_state
     def process(self, gs, delta):
-        if self.duration == self.max_duration:
-            MainScreen.additional_draws.append(self.beam)
-            Sound.play(Sound.DAMAGED)
-        self.duration -= delta
-        if self.duration > 0:
+        if not self.fired:
+            self.fired = True
+            Timeline.call(MainScreen.add_draw, self.beam)
+            Timeline.call(Sound.play, Sound.DAMAGED)
             return True
 
-        gs.player_shield -= self.damage
-        MainScreen.additional_draws.remove(self.beam)
-        Message.show("Attacked\nDamage: {}\nShield: {}".format(self.damage, gs.player_shield))
-        gs.generate_damage(1)
+        damage = sum(self.damages)
+        gs.player_shield -= damage
+        Timeline.call(MainScreen.remove_draw, self.beam)
+        if len(self.klingons) > 1:
+            Message.show("Attacked x{}\nDamage: {}\nShield: {}".format(len(self.klingons), damage, gs.player_shield))
+        else:
+            Message.show("Attacked\nDamage: {}\nShield: {}".format(damage, gs.player_shield))
+        for _ in self.damages:
+            gs.generate_damage(100 // gs.klingon_strength)
 
         if gs.player_shield <= 0:
             gs.player_shield = 0
@@ -279,8 +336,10 @@ class PhaserShotKlingon:
 
 
 class CheckKlingonAttack:
-    def __init__(self):
-        PendingAction.queue.append(self)
+    step = 0
+
+    def __init__(self, after=None):
+        PendingAction.add(self, after)
 
     def process(self, delta):
         if global_store.game_state.current_quadrant.klingons:
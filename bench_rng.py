@@ -0,0 +1,50 @@
+import gc
+import random
+import time
+
+from rng import Random
+
+
+CALLS = 1000
+
+try:
+    ticks_us = time.ticks_us
+    ticks_diff = time.ticks_diff
+except AttributeError:
+    def ticks_us():
+        return int(time.perf_counter() * 1000000)
+
+    def ticks_diff(end, start):
+        return end - start
+
+
+def mem_free():
+    try:
+        return gc.mem_free()
+    except AttributeError:
+        return 0
+
+
+def measure(name, func):
+    gc.collect()
+    free = mem_free()
+    started = ticks_us()
+    for _ in range(CALLS):
+        func()
+    elapsed = ticks_diff(ticks_us(), started)
+    allocated = free - mem_free()
+    print("{:<16}{:>8.2f} us{:>8} B".format(name, elapsed / CALLS, allocated))
+
+
+def run():
+    stream = Random(1)
+    random.seed(1)
+    print("{:<16}{:>11}{:>10}".format("case", "per call", "heap"))
+    measure("random.randint", lambda: random.randint(0, 63))
+    measure("Random.randint", lambda: stream.randint(0, 63))
+    measure("random.random", random.random)
+    measure("Random.random", stream.random)
+    measure("Random.bits", stream.bits)
+
+
+run()
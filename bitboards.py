@@ -0,0 +1,36 @@
+from utils import bresenham
+
+
+def cell_bit(x, y):
+    return 1 << (y * 8 + x)
+
+
+def _neighbourhood(idx):
+    ox = idx % 8
+    oy = idx // 8
+    mask = 0
+    for y in range(max(0, oy - 1), min(7, oy + 1) + 1):
+        for x in range(max(0, ox - 1), min(7, ox + 1) + 1):
+            mask |= cell_bit(x, y)
+    return mask
+
+
+NEIGHBOURHOOD = tuple(_neighbourhood(idx) for idx in range(64))
+
+
+BETWEEN = {}
+BETWEEN_LIMIT = 256
+
+
+def between(origin, target):
+    key = origin * 64 + target
+    mask = BETWEEN.get(key)
+    if mask is None:
+        if len(BETWEEN) >= BETWEEN_LIMIT:
+            BETWEEN.clear()
+        mask = 0
+        for x, y in bresenham(origin % 8, origin // 8, target % 8, target // 8):
+            mask |= cell_bit(x, y)
+        mask &= ~(1 << target)
+        BETWEEN[key] = mask
+    return mask
@@ -0,0 +1,62 @@
+import thumby
+
+
+class Display:
+    SET_COL_ADDR = 0x21
+    SET_PAGE_ADDR = 0x22
+    COLUMN_OFFSET = 28
+
+    width = 72
+    pages = 5
+
+    sent = bytearray(width * pages)
+    full = True
+    bytes_sent = 0
+
+    @classmethod
+    def invalidate(cls):
+        cls.full = True
+
+    @classmethod
+    def send(cls, page, start, end):
+        driver = thumby.display.display
+        offset = page * cls.width
+        driver.write_cmd(cls.SET_COL_ADDR)
+        driver.write_cmd(cls.COLUMN_OFFSET + start)
+        driver.write_cmd(cls.COLUMN_OFFSET + end - 1)
+        driver.write_cmd(cls.SET_PAGE_ADDR)
+        driver.write_cmd(page)
+        driver.write_cmd(page)
+        driver.write_data(memoryview(driver.buffer)[offset + start:offset + end])
+        cls.sent[offset + start:offset + end] = driver.buffer[offset + start:offset + end]
+        cls.bytes_sent += end - start
+
+    @classmethod
+    def update(cls):
+        buffer = thumby.display.display.buffer
+        sent = cls.sent
+
+        if cls.full:
+            cls.full = False
+            thumby.display.display.show()
+            sent[:] = buffer
+            cls.bytes_sent += len(buffer)
+            return True
+
+        if buffer == sent:
+            return False
+
+        width = cls.width
+        for page in range(cls.pages):
+            offset = page * width
+            start = 0
+            while start < width and buffer[offset + start] == sent[offset + start]:
+                start += 1
+            if start == width:
+                continue
+
+            end = width
+            while buffer[offset + end - 1] == sent[offset + end - 1]:
+                end -= 1
+            cls.send(page, start, end)
+        return True
@@ -0,0 +1,384 @@
+from array import array
+
+import global_store
+from bitboards import between, cell_bit
+from constants import Objects
+from rng import mix32, Streams
+from systems import Timeline
+from ui.screens import MainScreen
+
+
+class Quadrant:
+    cells = bytearray(64)
+    masks = [0, 0, 0, 0, 0]
+    occupied = 0
+    free = bytearray(64)
+    free_slots = bytearray(64)
+    free_count = 64
+    entities = [None] * 64
+    empty_cells = bytes(64)
+    no_entities = [None] * 64
+    all_cells = bytes(range(64))
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+        self.map = None
+
+    @property
+    def seed(self):
+        return self.table.seeds[self.row]
+
+    @property
+    def stars(self):
+        return self.table.stars[self.row]
+
+    @property
+    def klingons(self):
+        return self.table.klingons[self.row]
+
+    @klingons.setter
+    def klingons(self, value):
+        self.table.klingons[self.row] = value
+
+    @property
+    def starbase(self):
+        return bool(self.table.flags[self.row] & QuadrantTable.STARBASE)
+
+    @starbase.setter
+    def starbase(self, value):
+        self.table.set_flag(self.row, QuadrantTable.STARBASE, value)
+
+    @property
+    def visited(self):
+        return bool(self.table.flags[self.row] & QuadrantTable.VISITED)
+
+    @property
+    def destroyed(self):
+        offset = self.row * 8
+        return int.from_bytes(self.table.destroyed[offset:offset + 8], "little")
+
+    @destroyed.setter
+    def destroyed(self, value):
+        offset = self.row * 8
+        self.table.destroyed[offset:offset + 8] = value.to_bytes(8, "little")
+
+    @property
+    def scanned(self):
+        return bool(self.table.flags[self.row] & QuadrantTable.SCANNED)
+
+    @scanned.setter
+    def scanned(self, value):
+        self.table.set_flag(self.row, QuadrantTable.SCANNED, value)
+
+    def get_index(self):
+        return self.free[Streams.layout.randint(0, Quadrant.free_count - 1)]
+
+    def get(self, x, y):
+        if x < 0 or x > 7:
+            return Objects.NOTHINGNESS
+        if y < 0 or y > 7:
+            return Objects.NOTHINGNESS
+        if not self.map:
+            return Objects.NOTHINGNESS
+        return self.map[y * 8 + x]
+
+    def entity(self, x, y):
+        return self.entities[y * 8 + x]
+
+    def is_free(self, x, y):
+        return not Quadrant.occupied & cell_bit(x, y)
+
+    def line_of_sight(self, x1, y1, x2, y2):
+        blockers = self.masks[Objects.STAR] | self.masks[Objects.STARBASE]
+        return not between(y1 * 8 + x1, y2 * 8 + x2) & blockers
+
+    def nearest_free(self, x, y):
+        for radius in range(8):
+            for ny in range(max(0, y - radius), min(7, y + radius) + 1):
+                for nx in range(max(0, x - radius), min(7, x + radius) + 1):
+                    if self.is_free(nx, ny):
+                        return nx, ny
+        return x, y
+
+    def destroy(self, x, y):
+        self.destroyed |= cell_bit(x, y)
+        self.set(x, y, Objects.NOTHINGNESS)
+
+    def add_klingon(self, index, shields):
+        klingons = global_store.game_state.klingons
+        klingon = Klingon(x=index % 8, y=index // 8, shields=shields, slot=len(klingons))
+        klingons.append(klingon)
+        self.place(index, Objects.KLINGON)
+        self.entities[index] = klingon
+        return klingon
+
+    def remove_klingon(self, klingon):
+        klingons = global_store.game_state.klingons
+        last = klingons.pop()
+        if last is not klingon:
+            klingons[klingon.slot] = last
+            last.slot = klingon.slot
+        self.set(klingon.x, klingon.y, Objects.NOTHINGNESS)
+
+    def store(self, klingons):
+        table = self.table
+        offset = self.row * table.slots
+        for slot in range(table.slots):
+            if slot < len(klingons):
+                klingon = klingons[slot]
+                table.fleet[offset + slot] = klingon.y * 8 + klingon.x
+                table.shields[offset + slot] = klingon.shields
+            else:
+                table.fleet[offset + slot] = QuadrantTable.EMPTY
+                table.shields[offset + slot] = 0
+        table.flags[self.row] |= QuadrantTable.VISITED
+
+    def set(self, x, y, obj):
+        if x < 0 or x > 7:
+            return False
+        if y < 0 or y > 7:
+            return False
+        if not self.map:
+            return False
+        self.place(y * 8 + x, obj)
+        Timeline.call(MainScreen.set_cell, x, y, obj)
+        return True
+
+    def place(self, idx, obj):
+        previous = self.map[idx]
+        if previous == obj:
+            return
+
+        self.map[idx] = obj
+        if previous == Objects.KLINGON:
+            self.entities[idx] = None
+        bit = 1 << idx
+        if previous:
+            self.masks[previous] &= ~bit
+        if obj:
+            self.masks[obj] |= bit
+
+        free = self.free
+        slots = self.free_slots
+        if not previous:
+            Quadrant.occupied |= bit
+            Quadrant.free_count -= 1
+            last = free[Quadrant.free_count]
+            slot = slots[idx]
+            free[slot] = last
+            slots[last] = slot
+            free[Quadrant.free_count] = idx
+            slots[idx] = Quadrant.free_count
+        elif not obj:
+            Quadrant.occupied &= ~bit
+            first = free[Quadrant.free_count]
+            slot = slots[idx]
+            free[slot] = first
+            slots[first] = slot
+            free[Quadrant.free_count] = idx
+            slots[idx] = Quadrant.free_count
+            Quadrant.free_count += 1
+
+    def generate_map(self):
+        gs = global_store.game_state
+        Streams.layout.seed(self.seed)
+
+        self.map = self.cells
+        self.map[:] = self.empty_cells
+        for obj in range(len(self.masks)):
+            self.masks[obj] = 0
+        self.entities[:] = self.no_entities
+        Quadrant.occupied = 0
+        self.free[:] = self.all_cells
+        self.free_slots[:] = self.all_cells
+        Quadrant.free_count = 64
+
+        for _ in range(self.stars):
+            self.place(self.get_index(), Objects.STAR)
+
+        if self.starbase:
+            self.place(self.get_index(), Objects.STARBASE)
+
+        destroyed = self.destroyed
+        if destroyed:
+            for idx in range(64):
+                if destroyed >> idx & 1:
+                    self.place(idx, Objects.NOTHINGNESS)
+
+        gs.klingons.clear()
+        if self.visited:
+            table = self.table
+            offset = self.row * table.slots
+            for slot in range(table.slots):
+                index = table.fleet[offset + slot]
+                if index != QuadrantTable.EMPTY:
+                    self.add_klingon(index, table.shields[offset + slot])
+
+        if not self.is_free(gs.player_x, gs.player_y):
+            gs.player_x, gs.player_y = self.nearest_free(gs.player_x, gs.player_y)
+        self.place(gs.player_y * 8 + gs.player_x, Objects.PLAYER)
+
+        if not self.visited:
+            for _ in range(self.klingons):
+                self.add_klingon(self.get_index(), max(1, Streams.layout.randint(300, 500) * gs.klingon_strength // 100))
+            self.store(gs.klingons)
+
+        Timeline.call(MainScreen.set_map, bytes(self.map))
+
+
+class Klingon:
+    __slots__ = ("x", "y", "shields", "slot")
+
+    def __init__(self, x, y, shields, slot=0):
+        self.x = x
+        self.y = y
+        self.shields = shields
+        self.slot = slot
+
+
+class QuadrantTable:
+    STARBASE = 1
+    SCANNED = 2
+    VISITED = 4
+    EMPTY = 0xFF
+
+    def __init__(self, size=0, slots=3):
+        self.slots = slots
+        self.seeds = array("I", bytearray(4 * size))
+        self.stars = bytearray(size)
+        self.klingons = bytearray(size)
+        self.flags = bytearray(size)
+        self.destroyed = bytearray(8 * size)
+        self.fleet = bytearray(b"\xff" * (slots * size))
+        self.shields = array("H", bytearray(2 * slots * size))
+
+    def __len__(self):
+        return len(self.flags)
+
+    def append(self, seed, stars):
+        self.seeds.append(seed)
+        self.stars.append(stars)
+        self.klingons.append(0)
+        self.flags.append(0)
+        self.destroyed.extend(bytes(8))
+        for _ in range(self.slots):
+            self.fleet.append(self.EMPTY)
+            self.shields.append(0)
+        return len(self.flags) - 1
+
+    def set_flag(self, row, flag, value):
+        if value:
+            self.flags[row] |= flag
+        else:
+            self.flags[row] &= ~flag
+
+
+class Galaxy:
+    lazy = False
+
+    def __init__(self, w, h, table=None):
+        self.w = w
+        self.h = h
+        self.table = QuadrantTable() if table is None else table
+        self.area = (0, 0, w, h)
+
+    def set_theatre(self, x, y, size):
+        if not size:
+            return
+
+        w = min(size, self.w)
+        h = min(size, self.h)
+        self.area = (min(max(0, x - w // 2), self.w - w), min(max(0, y - h // 2), self.h - h), w, h)
+
+    def generate(self, starbases, klingons, max_klingons):
+        self.table = QuadrantTable(self.w * self.h, max_klingons)
+        seeds = self.table.seeds
+        stars = self.table.stars
+        rng = Streams.galaxy
+        for row in range(self.w * self.h):
+            seeds[row] = rng.bits()
+            stars[row] = rng.randint(1, 9)
+
+        self.scatter(starbases, klingons, max_klingons)
+
+    def scatter(self, starbases, klingons, max_klingons):
+        flags = self.table.flags
+        for _ in range(starbases):
+            while True:
+                row = self.random_row()
+                if flags[row] & QuadrantTable.STARBASE:
+                    continue
+
+                flags[row] |= QuadrantTable.STARBASE | QuadrantTable.SCANNED
+                break
+
+        counts = self.table.klingons
+        remaining = klingons
+        while remaining > 0:
+            row = self.random_row()
+            if counts[row] >= max_klingons:
+                continue
+            count = min(Streams.galaxy.randint(1, max_klingons), max_klingons - counts[row], remaining)
+            remaining -= count
+            counts[row] += count
+
+    def random_row(self):
+        x, y, w, h = self.area
+        return self.materialize(x + Streams.galaxy.randint(0, w - 1), y + Streams.galaxy.randint(0, h - 1))
+
+    def row(self, x, y):
+        return y * self.w + x
+
+    def materialize(self, x, y):
+        return y * self.w + x
+
+    def get(self, x, y):
+        return Quadrant(self.table, self.materialize(x, y))
+
+    def scan(self, x, y):
+        self.table.flags[self.materialize(x, y)] |= QuadrantTable.SCANNED
+
+    def is_scanned(self, x, y):
+        row = self.row(x, y)
+        return row >= 0 and self.table.flags[row] & QuadrantTable.SCANNED
+
+
+class LazyGalaxy(Galaxy):
+    lazy = True
+
+    def __init__(self, w, h, seed=None, table=None, indexes=None):
+        super().__init__(w, h, table)
+        self.seed = Streams.galaxy.bits() if seed is None else seed
+        self.indexes = array("I") if indexes is None else indexes
+        self.rows = {}
+        for row, index in enumerate(self.indexes):
+            self.rows[index] = row
+
+    def generate(self, starbases, klingons, max_klingons):
+        self.table = QuadrantTable(slots=max_klingons)
+        self.scatter(starbases, klingons, max_klingons)
+
+    def row(self, x, y):
+        return self.rows.get(y * self.w + x, -1)
+
+    def materialize(self, x, y):
+        index = y * self.w + x
+        row = self.rows.get(index, -1)
+        if row < 0:
+            seed = mix32(self.seed ^ mix32(index))
+            row = self.table.append(seed, 1 + seed % 9)
+            self.indexes.append(index)
+            self.rows[index] = row
+        return row
+
+
+def load_galaxy(data):
+    table = QuadrantTable(len(data))
+    for row, quadrant in enumerate(data):
+        table.seeds[row] = quadrant["seed"]
+        table.stars[row] = quadrant["stars"]
+        table.klingons[row] = quadrant["klingons"]
+        table.set_flag(row, QuadrantTable.STARBASE, quadrant["starbase"])
+        table.set_flag(row, QuadrantTable.SCANNED, quadrant["scanned"])
+    return Galaxy(5, 6, table)
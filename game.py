@@ -1,104 +1,33 @@
-import random
-import time
-
 import global_store
-from actions import PlayerMovement, PhaserShotKlingon, PhaserShotPlayer, TorpedoMovement, CheckKlingonAttack, PendingAction
+from actions import PlayerMovement, PlayerVolley, KlingonVolley, TorpedoMovement, CheckKlingonAttack, PendingAction
 from constants import Objects
-from systems import Sound, Message
+from systems import Sound, Message, Timeline
 from utils import *
+from bitboards import NEIGHBOURHOOD
+from galaxy import Galaxy, LazyGalaxy, load_galaxy
+from rng import Streams
+from tables import falloff
+from storage import Storage
+from recorder import Recorder
 from ui.screens import GameOverScreen
 
 
-class Quadrant:
-    def __init__(self):
-        self.seed = random.getrandbits(32)
-        self.stars = 0
-        self.klingons = 0
-        self.starbase = False
-        self.scanned = False
-        self.map = None
-
-    def get_index(self):
-        while True:
-            idx = random.randint(0, 63)
-            if self.map[idx] == Objects.NOTHINGNESS:
-                return idx
-
-    def get(self, x, y):
-        if x < 0 or x > 7:
-            return Objects.NOTHINGNESS
-        if y < 0 or y > 7:
-            return Objects.NOTHINGNESS
-        if not self.map:
-            return Objects.NOTHINGNESS
-        return self.map[y * 8 + x]
-
-    def set(self, x, y, obj):
-        if x < 0 or x > 8:
-            return False
-        if y < 0 or y > 8:
-            return False
-        if not self.map:
-            return False
-        self.map[y * 8 + x] = obj
-        return True
-
-    def generate_map(self):
-        random.seed(self.seed)
-
-        self.map = [Objects.NOTHINGNESS for _ in range(64)]
-        self.map[global_store.game_state.player_y * 8 + global_store.game_state.player_x] = Objects.PLAYER
-
-        if self.starbase:
-            self.map[self.get_index()] = Objects.STARBASE
-
-        for _ in range(self.stars):
-            self.map[self.get_index()] = Objects.STAR
-
-        random.seed(time.ticks_us())
-
-        global_store.game_state.klingons.clear()
-        for _ in range(self.klingons):
-            index = self.get_index()
-            self.map[index] = Objects.KLINGON
-            global_store.game_state.klingons.append(Klingon(x=index % 8, y=index // 8, shields=random.randint(300, 500)))
-
-    def save(self):
-        return {
-            "seed": self.seed,
-            "stars": self.stars,
-            "klingons": self.klingons,
-            "starbase": self.starbase,
-            "scanned": self.scanned,
-        }
-
-    @classmethod
-    def load(cls, data):
-        quadrant = cls()
-        quadrant.seed = data["seed"]
-        quadrant.stars = data["stars"]
-        quadrant.klingons = data["klingons"]
-        quadrant.starbase = data["starbase"]
-        quadrant.scanned = data["scanned"]
-        return quadrant
-
-
-class Klingon:
-    def __init__(self, x, y, shields):
-        self.x = x
-        self.y = y
-        self.shields = shields
-
-
 class GameState:
-    quadrants_w = 5
-    quadrants_h = 6
+    max_screens = 4
+    # w, h, lazy, klingons per quadrant, klingon strength %, theatre size, klingons, starbases, days
+    galaxy_modes = {
+        "Classic": (5, 6, False, 3, 100, 0, (15, 21), (2, 5), (40, 50)),
+        "Large": (64, 64, True, 3, 100, 12, (70, 90), (10, 16), (200, 240)),
+        "Huge": (4096, 4096, True, 3, 100, 16, (120, 160), (16, 28), (360, 420)),
+        "Fleet": (5, 6, False, 24, 8, 0, (120, 168), (3, 6), (40, 50)),
+    }
 
     def __init__(self):
         global_store.game_state = self
 
         self.screen = None
         self.screens = []
+        self.screen_pool = {}
 
         self.max_player_energy = 3000
         self.player_energy = 2500
@@ -118,100 +47,119 @@ class GameState:
         self.is_docked = False
         self.current_quadrant = None
         self.max_klingons_in_quadrant = 3
+        self.klingon_strength = 100
         self.klingons_remaining = 0
         self.klingons = []
-        self.quadrants = []
+        self.galaxy = None
+        self.over = False
 
         self.last_nav_course = 1.0
         self.last_torpedo_course = 1.0
 
-    def generate(self):
+    def generate(self, mode="Classic"):
+        self.clear()
+        w, h, lazy, max_klingons, strength, theatre, klingons, starbases, days = self.galaxy_modes[mode]
+        self.galaxy = LazyGalaxy(w, h) if lazy else Galaxy(w, h)
+        rng = Streams.galaxy
+
         self.max_player_energy = 3000
         self.player_energy = 2500
         self.player_shield = 500
         self.player_torpedoes = 10
-        self.player_quadrant_x = random.randint(0, self.quadrants_w - 1)
-        self.player_quadrant_y = random.randint(0, self.quadrants_h - 1)
-        self.player_x = random.randint(0, 7)
-        self.player_y = random.randint(0, 7)
+        self.player_quadrant_x = rng.randint(0, w - 1)
+        self.player_quadrant_y = rng.randint(0, h - 1)
+        self.player_x = rng.randint(0, 7)
+        self.player_y = rng.randint(0, 7)
         self.navigation_damage = 0
         self.lrs_damage = 0
         self.torpedo_damage = 0
         self.phasers_damage = 0
         self.shield_damage = 0
-        self.starbases_left = random.randint(2, 5)
-        self.time_remaining = random.randint(40, 50)
+        self.starbases_left = rng.randint(*starbases)
+        self.time_remaining = rng.randint(*days)
         self.is_docked = False
         self.current_quadrant = None
-        self.max_klingons_in_quadrant = 3
-        self.klingons_remaining = random.randint(15, 21)
+        self.max_klingons_in_quadrant = max_klingons
+        self.klingon_strength = strength
+        self.klingons_remaining = rng.randint(*klingons)
         self.klingons = []
-        self.quadrants = []
 
         self.last_nav_course = 1.0
         self.last_torpedo_course = 1.0
 
-        for i in range(30):
-            quadrant = Quadrant()
-            quadrant.stars = random.randint(1, 9)
-            self.quadrants.append(quadrant)
-
-        for _ in range(self.starbases_left):
-            while True:
-                quadrant = random.choice(self.quadrants)
-                if quadrant.starbase:
-                    continue
-
-                quadrant.starbase = True
-                quadrant.scanned = True
-                break
-
-        remaining = self.klingons_remaining
-        while remaining > 0:
-            quadrant = random.choice(self.quadrants)
-            if quadrant.klingons >= self.max_klingons_in_quadrant:
-                continue
-            klingons = min(random.randint(1, self.max_klingons_in_quadrant), self.max_klingons_in_quadrant - quadrant.klingons)
-            remaining -= klingons
-            quadrant.klingons = klingons
+        self.galaxy.set_theatre(self.player_quadrant_x, self.player_quadrant_y, theatre)
+        self.galaxy.generate(self.starbases_left, self.klingons_remaining, self.max_klingons_in_quadrant)
 
-        self.current_quadrant = self.quadrants[self.player_quadrant_x + self.player_quadrant_y * self.quadrants_w]
+        self.current_quadrant = self.galaxy.get(self.player_quadrant_x, self.player_quadrant_y)
         self.current_quadrant.generate_map()
         self.show_start_message()
 
     def show_start_message(self):
         Message.show("{} klingons\n{} starbases\n{} days".format(self.klingons_remaining, self.starbases_left, self.time_remaining))
 
-    def change_screen(self, screen_class, *args, **kwargs):
+    def get_screen(self, screen_class, *args):
+        screen = self.screen_pool.get(screen_class)
+        if screen is None:
+            screen = screen_class()
+            self.screen_pool[screen_class] = screen
+        screen.setup(*args)
+        return screen
+
+    def show_screen(self, screen):
+        self.screen = screen
+        self.screen.enter()
+
+    def change_screen(self, screen_class, *args):
         if type(self.screen) == screen_class:
             return
 
         if self.screen:
             self.screen.exit()
 
-        self.screen = screen_class(*args, **kwargs)
-        self.screen.enter()
-        self.screens.append(self.screen)
+        for idx, screen in enumerate(self.screens):
+            if type(screen) == screen_class:
+                del self.screens[idx + 1:]
+                return self.show_screen(screen)
+
+        if len(self.screens) >= self.max_screens:
+            self.screens.pop()
+        self.screens.append(self.get_screen(screen_class, *args))
+        self.show_screen(self.screens[-1])
+
+    def replace_screen(self, screen_class, *args):
+        if self.screen:
+            self.screen.exit()
+            self.screens.pop()
+
+        self.screens.append(self.get_screen(screen_class, *args))
+        self.show_screen(self.screens[-1])
+
+    def reset_screen(self, screen_class, *args):
+        if self.screen:
+            self.screen.exit()
+
+        self.screens.clear()
+        self.screens.append(self.get_screen(screen_class, *args))
+        self.show_screen(self.screens[-1])
 
     def pop_screen(self):
+        if len(self.screens) < 2:
+            return
+
         self.screen.exit()
         self.screens.pop()
-        self.screen = self.screens[-1]
-        self.screen.enter()
+        self.show_screen(self.screens[-1])
 
     def is_docking_area(self, ox, oy):
-        for x in range(ox - 1, ox + 2):
-            for y in range(oy - 1, oy + 2):
-                if self.current_quadrant.get(x, y) == Objects.STARBASE:
-                    return True
-        return False
+        return bool(self.current_quadrant.masks[Objects.STARBASE] & NEIGHBOURHOOD[oy * 8 + ox])
 
     def generate_damage(self, chance=6):
-        if random.randint(0, chance):
+        rng = Streams.damage
+        if rng.randint(0, chance):
             return
 
-        damage = random.randint(1, 5)
-        item = random.randint(0, 4)
+        damage = rng.randint(1, 5)
+        item = rng.randint(0, 4)
         if item == 0:
             self.navigation_damage = damage
             Message.show("Navigation\ndamaged")
@@ -228,6 +176,9 @@ class GameState:
             self.shield_damage = damage
             Message.show("Shield\ndamaged")
 
+    def is_fleet_battle(self):
+        return self.klingon_strength < 100
+
     def has_damage(self):
         return self.navigation_damage or self.lrs_damage or self.torpedo_damage or self.phasers_damage or self.shield_damage
 
@@ -251,17 +202,18 @@ class GameState:
 
         PlayerMovement(direction, distance)
 
-    def destroy_klingon(self, klingon):
-        self.klingons.remove(klingon)
-        Message.show("Klingon\ndestroyed")
+    def destroy_klingon(self, klingon, report=True):
+        self.current_quadrant.remove_klingon(klingon)
+        if report:
+            Message.show("Klingon\ndestroyed")
 
         self.klingons_remaining -= 1
         if self.klingons_remaining <= 0:
             return self.game_over("Victory")
 
         self.current_quadrant.klingons -= 1
-        self.current_quadrant.set(klingon.x, klingon.y, Objects.NOTHINGNESS)
-        Sound.play(Sound.EXPLOSION)
+        if report:
+            Timeline.call(Sound.play, Sound.EXPLOSION)
 
     def generate_klingon_attack(self):
         if not self.klingons:
@@ -271,11 +223,20 @@ class GameState:
             Message.show("Protected by\nstarbase")
             return
 
+        targets = []
+        damages = []
+        quadrant = self.current_quadrant
         for klingon in self.klingons:
-            dist = distance(klingon.x, klingon.y, self.player_x, self.player_y)
-            damage = int(300 * random.random() * (1.0 - dist / 11.3))
+            if not quadrant.line_of_sight(self.player_x, self.player_y, klingon.x, klingon.y):
+                continue
+
+            damage = int(3 * self.klingon_strength * Streams.combat.random() * falloff(klingon.x, klingon.y, self.player_x, self.player_y))
             if damage:
-                PhaserShotKlingon(klingon, damage)
+                targets.append(klingon)
+                damages.append(damage)
+
+        if targets:
+            KlingonVolley(targets, damages)
 
     def launch_torpedo(self, direction):
         if not self.player_torpedoes or self.torpedo_damage:
@@ -288,19 +249,34 @@ class GameState:
         if not self.klingons or self.phasers_damage:
             return
 
-        for klingon in self.klingons:
-            self.player_energy -= power
+        quadrant = self.current_quadrant
+        visible = [
+            klingon for klingon in self.klingons
+            if quadrant.line_of_sight(self.player_x, self.player_y, klingon.x, klingon.y)
+        ]
+
+        targets = []
+        damages = []
+        if visible:
+            if self.is_fleet_battle():
+                self.player_energy -= power
+                share = power / len(visible)
+            else:
+                self.player_energy -= power * len(visible)
+                share = power
             if self.player_energy < 0:
                 self.player_energy = 0
                 return self.game_over("energy\ndelpleted")
 
-            dist = distance(klingon.x, klingon.y, self.player_x, self.player_y)
-            damage = int(power * (1.0 - dist / 11.3))
-            if damage:
-                PhaserShotPlayer(klingon, damage)
+            for klingon in visible:
+                damage = int(share * falloff(klingon.x, klingon.y, self.player_x, self.player_y))
+                if damage:
+                    targets.append(klingon)
+                    damages.append(damage)
 
+        shots = [PlayerVolley(targets, damages)] if targets else []
         if self.klingons:
-            CheckKlingonAttack()
+            CheckKlingonAttack(shots)
 
     def set_shield(self, power):
         difference = power - self.player_shield
@@ -333,6 +309,16 @@ class GameState:
             else:
                 self.generate_damage()
 
+        if not PendingAction.queue:
+            self.end_turn()
+
+    def end_turn(self):
+        if self.over or not self.galaxy:
+            return
+
+        self.current_quadrant.store(self.klingons)
+        Storage.commit(self)
+
     def repair(self):
         if self.navigation_damage:
             self.navigation_damage -= 1
@@ -356,7 +342,9 @@ class GameState:
                 Message.show("Shield\nrepaired")
 
     def game_over(self, message):
-        self.change_screen(GameOverScreen, message)
+        self.over = True
+        PendingAction.queue.clear()
+        Timeline.call(self.reset_screen, GameOverScreen, message)
 
     def spend_time(self, amount):
         self.time_remaining -= amount
@@ -390,33 +378,59 @@ class GameState:
 
     def clear(self):
         self.klingons.clear()
-        self.quadrants.clear()
+        self.galaxy = None
+        self.over = False
         Message.queue.clear()
         Sound.queue.clear()
         PendingAction.queue.clear()
+        Timeline.clear()
 
-    def save(self):
-        save = thumby.saveData.setItem
-        for field in self._get_save_fields():
-            save(field, getattr(self, field))
+    def has_save(self):
+        return Storage.has_save() or thumby.saveData.hasItem("quadrants")
 
-        quadrants = []
-        for quadrant in self.quadrants:
-            quadrants.append(quadrant.save())
-        save("quadrants", quadrants)
-        thumby.saveData.save()
+    def delete_save(self):
+        Storage.delete()
+        thumby.saveData.delItem("quadrants")
 
-    def load(self):
+    def quit(self):
+        Recorder.stop()
+        thumby.reset()
+
+    def recording(self):
+        return Recorder.enabled
+
+    def toggle_recording(self):
+        Recorder.enable(not Recorder.enabled)
+
+    def save(self):
+        self.current_quadrant.store(self.klingons)
+        Storage.save(self)
+
+    def load_legacy(self):
+        self.klingon_strength = 100
         load = thumby.saveData.getItem
         for field in self._get_save_fields():
             setattr(self, field, load(field))
+        return load_galaxy(load("quadrants"))
+
+    def load(self):
+        if not self.has_save():
+            return False
+
+        if Storage.has_save():
+            galaxy = Storage.load(self)
+        else:
+            galaxy = self.load_legacy()
+
+        if galaxy is None:
+            return False
 
         self.clear()
         Message.show("Game loaded")
-        quadrants = load("quadrants")
-        for quadrant in quadrants:
-            self.quadrants.append(Quadrant.load(quadrant))
+        self.galaxy = galaxy
+        self.max_klingons_in_quadrant = galaxy.table.slots
 
-        self.current_quadrant = self.quadrants[self.player_quadrant_x + self.player_quadrant_y * self.quadrants_w]
+        self.current_quadrant = self.galaxy.get(self.player_quadrant_x, self.player_quadrant_y)
         self.current_quadrant.generate_map()
         self.show_start_message()
+        return True
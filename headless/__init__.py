@@ -0,0 +1,51 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from headless.clock import clock
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_scratch = None
+
+
+def scratch_directory():
+    global _scratch
+    if _scratch is None:
+        _scratch = tempfile.mkdtemp(prefix="threk-")
+        atexit.register(shutil.rmtree, _scratch, True)
+    return _scratch
+
+
+def install():
+    from headless import thumby
+
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+    time.ticks_ms = clock.ticks_ms
+    time.ticks_us = clock.ticks_us
+    time.ticks_diff = clock.ticks_diff
+    time.ticks_add = clock.ticks_add
+    time.sleep_ms = clock.sleep_ms
+    time.sleep_us = clock.sleep_us
+
+    sys.modules["thumby"] = thumby
+
+    import storage
+    storage.Storage.directory = os.path.join(scratch_directory(), "Saves")
+
+    import utils
+    fonts = os.path.join(scratch_directory(), "fonts")
+    os.makedirs(fonts, exist_ok=True)
+    for size, (path, width, height, space) in list(utils.FONTS.items()):
+        if not os.path.exists(path):
+            path = os.path.join(fonts, os.path.basename(path))
+            with open(path, "wb") as fh:
+                fh.write(thumby.synthesize_font(width, height))
+            utils.FONTS[size] = (path, width, height, space)
+    return thumby
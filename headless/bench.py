@@ -0,0 +1,361 @@
+import argparse
+import json
+import math
+import random
+import sys
+import time
+
+from headless import install
+from headless.clock import clock
+
+thumby = install()
+
+import global_store
+from game import GameState
+from actions import PendingAction
+from systems import Message, Timeline
+from ui.screens import MainScreen, LRSScreen
+from ui.sidebars import MainSidebar
+from ui.widgets import invalidate_widgets
+from utils import bresenham, direction_to_angle, distance, draw_arrow
+from bitboards import BETWEEN
+from display import Display
+from galaxy import QuadrantTable
+from rng import Streams
+from tables import Tables, falloff
+
+
+def new_game(seed=1):
+    Streams.seed(seed)
+    clock.reset()
+    Timeline.fast = False
+    Message.queue.clear()
+    gs = GameState()
+    gs.generate()
+    gs.change_screen(MainScreen)
+    Message.queue.clear()
+    return gs
+
+
+def bench_generate_map(gs):
+    return gs.current_quadrant.generate_map
+
+
+def bench_draw_map(gs):
+    screen = gs.screen
+
+    def run():
+        MainScreen.invalidate()
+        screen.draw_map()
+    return run
+
+
+def bench_draw_map_idle(gs):
+    screen = gs.screen
+    screen.draw_map()
+    return screen.draw_map
+
+
+def bench_lrs_draw(gs):
+    screen = LRSScreen()
+    screen.enter()
+
+    def run():
+        screen.grid.invalidate()
+        screen.draw()
+    return run
+
+
+def bench_lrs_draw_idle(gs):
+    screen = LRSScreen()
+    screen.enter()
+    return screen.draw
+
+
+def bench_sidebar_draw(gs):
+    sidebar = MainSidebar(MainScreen.sidebar_x, MainScreen.sidebar_y)
+
+    def run():
+        invalidate_widgets(sidebar.widgets)
+        sidebar.draw()
+    return run
+
+
+def bench_sidebar_draw_idle(gs):
+    return MainSidebar(MainScreen.sidebar_x, MainScreen.sidebar_y).draw
+
+
+def bench_bresenham(gs):
+    def run():
+        for _ in bresenham(0, 0, 39, 17):
+            pass
+    return run
+
+
+def bench_falloff_math(gs):
+    def run():
+        for cell in range(64):
+            1.0 - distance(3, 4, cell % 8, cell // 8) / 11.3
+    return run
+
+
+def bench_falloff_table(gs):
+    def run():
+        for cell in range(64):
+            falloff(3, 4, cell % 8, cell // 8)
+    return run
+
+
+def bench_torpedo_path_math(gs):
+    def run():
+        for course in range(80):
+            angle = direction_to_angle(1.0 + course / 10.0)
+            for x, y in bresenham(3, 4, 3 + math.cos(angle) * 11.3, 4 + math.sin(angle) * 11.3):
+                if x < 0 or y < 0 or x > 7 or y > 7:
+                    break
+    return run
+
+
+def bench_torpedo_path_table(gs):
+    def run():
+        for course in range(80):
+            for cell in Tables.torpedo_path(35, course):
+                pass
+    return run
+
+
+def bench_arrow_math(gs):
+    def run():
+        for course in range(80):
+            draw_arrow(40, 27, 20, direction_to_angle(1.0 + course / 10.0), 30, 4)
+    return run
+
+
+def bench_arrow_table(gs):
+    def run():
+        for course in range(80):
+            x1, y1, x2, y2, x3, y3, x4, y4 = Tables.arrow(course, 20, 30, 4)
+            thumby.display.drawLine(40 + x1, 27 + y1, 40 + x2, 27 + y2, 1)
+            thumby.display.drawLine(40 + x2, 27 + y2, 40 + x3, 27 + y3, 1)
+            thumby.display.drawLine(40 + x2, 27 + y2, 40 + x4, 27 + y4, 1)
+    return run
+
+
+def bench_line_of_sight(gs):
+    quadrant = gs.current_quadrant
+
+    def run():
+        for cell in range(64):
+            quadrant.line_of_sight(gs.player_x, gs.player_y, cell % 8, cell // 8)
+    return run
+
+
+def bench_line_of_sight_move(gs):
+    quadrant = gs.current_quadrant
+
+    def run():
+        BETWEEN.clear()
+        for cell in (0, 7, 63):
+            quadrant.line_of_sight(gs.player_x, gs.player_y, cell % 8, cell // 8)
+    return run
+
+
+def bench_random_randint(gs):
+    def run():
+        for _ in range(100):
+            random.randint(0, 63)
+    return run
+
+
+def bench_stream_randint(gs):
+    rng = Streams.combat
+
+    def run():
+        for _ in range(100):
+            rng.randint(0, 63)
+    return run
+
+
+def bench_save(gs):
+    return gs.save
+
+
+def bench_load(gs):
+    gs.save()
+
+    def run():
+        gs.load()
+        Message.queue.clear()
+    return run
+
+
+def enter_klingon_quadrant(gs):
+    galaxy = gs.galaxy
+    for y in range(galaxy.h):
+        for x in range(galaxy.w):
+            if galaxy.table.klingons[galaxy.row(x, y)]:
+                gs.player_quadrant_x = x
+                gs.player_quadrant_y = y
+                gs.current_quadrant = galaxy.get(x, y)
+                gs.current_quadrant.generate_map()
+                return
+
+
+def bench_resolve_combat(gs):
+    Timeline.fast = True
+    enter_klingon_quadrant(gs)
+
+    def run():
+        gs.current_quadrant.generate_map()
+        gs.player_shield = 10 ** 6
+        gs.player_energy = 10 ** 6
+        gs.shoot_phasers(200)
+        PendingAction.resolve()
+        Message.queue.clear()
+    return run
+
+
+def bench_resolve_fleet(gs):
+    gs.generate("Fleet")
+    Message.queue.clear()
+    Timeline.fast = True
+    galaxy = gs.galaxy
+    row = galaxy.row(gs.player_quadrant_x, gs.player_quadrant_y)
+    galaxy.table.klingons[row] = gs.max_klingons_in_quadrant
+    galaxy.table.set_flag(row, QuadrantTable.VISITED, False)
+    gs.current_quadrant.generate_map()
+
+    def run():
+        gs.current_quadrant.generate_map()
+        gs.player_shield = 60000
+        gs.player_energy = 60000
+        gs.shoot_phasers(100)
+        PendingAction.resolve()
+        Message.queue.clear()
+    return run
+
+
+def bench_frame(gs):
+    screen = gs.screen
+
+    def run():
+        screen.draw()
+        Display.update()
+    return run
+
+
+def bench_frame_full(gs):
+    screen = gs.screen
+
+    def run():
+        MainScreen.invalidate()
+        screen.main_sidebar.enter()
+        screen.draw()
+        Display.invalidate()
+        Display.update()
+    return run
+
+
+BENCHMARKS = (
+    ("generate_map", bench_generate_map, 200),
+    ("draw_map", bench_draw_map, 200),
+    ("draw_map_idle", bench_draw_map_idle, 2000),
+    ("lrs_draw", bench_lrs_draw, 100),
+    ("lrs_draw_idle", bench_lrs_draw_idle, 2000),
+    ("sidebar_draw", bench_sidebar_draw, 200),
+    ("sidebar_draw_idle", bench_sidebar_draw_idle, 2000),
+    ("bresenham", bench_bresenham, 2000),
+    ("falloff_math", bench_falloff_math, 1000),
+    ("falloff_table", bench_falloff_table, 1000),
+    ("torpedo_math", bench_torpedo_path_math, 200),
+    ("torpedo_table", bench_torpedo_path_table, 200),
+    ("arrow_math", bench_arrow_math, 100),
+    ("arrow_table", bench_arrow_table, 100),
+    ("line_of_sight", bench_line_of_sight, 1000),
+    ("line_of_sight_move", bench_line_of_sight_move, 1000),
+    ("random_randint", bench_random_randint, 500),
+    ("stream_randint", bench_stream_randint, 500),
+    ("save", bench_save, 100),
+    ("load", bench_load, 100),
+    ("resolve_combat", bench_resolve_combat, 500),
+    ("resolve_fleet", bench_resolve_fleet, 200),
+    ("frame", bench_frame, 200),
+    ("frame_full", bench_frame_full, 200),
+)
+
+
+def measure(func, runs):
+    calls = thumby.display.calls
+    sent = thumby.display.display.bytes_sent
+    start = time.perf_counter()
+    for _ in range(runs):
+        func()
+    elapsed = time.perf_counter() - start
+    return (
+        elapsed * 1e6 / runs,
+        (thumby.display.calls - calls) / runs,
+        (thumby.display.display.bytes_sent - sent) / runs,
+    )
+
+
+def run(names=None, scale=1.0):
+    results = {}
+    for name, factory, runs in BENCHMARKS:
+        if names and name not in names:
+            continue
+        gs = new_game()
+        func = factory(gs)
+        func()
+        us, calls, sent = measure(func, max(1, int(runs * scale)))
+        results[name] = {"us": us, "fps": 1e6 / us if us else 0.0, "calls": calls, "bytes": sent}
+    return results
+
+
+def report(results, out=sys.stdout):
+    out.write("{:<16}{:>12}{:>12}{:>10}{:>10}\n".format("benchmark", "us/op", "ops/s", "calls", "bytes"))
+    for name, result in results.items():
+        out.write("{:<16}{:>12.1f}{:>12.1f}{:>10.1f}{:>10.1f}\n".format(
+            name, result["us"], result["fps"], result["calls"], result["bytes"]
+        ))
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        limit = baseline[name]["us"] * (1.0 + tolerance)
+        if result["us"] > limit:
+            regressions.append((name, baseline[name]["us"], result["us"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Threk benchmarks")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply the number of runs")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    results = run(args.names, args.scale)
+    report(results)
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, before, after in regressions:
+            sys.stdout.write("REGRESSION {}: {:.1f}us -> {:.1f}us\n".format(name, before, after))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
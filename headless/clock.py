@@ -0,0 +1,38 @@
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALF = TICKS_PERIOD // 2
+
+
+class Clock:
+    def __init__(self):
+        self.us = 0
+
+    def reset(self, us=0):
+        self.us = us
+
+    def advance(self, ms):
+        self.us += int(ms * 1000)
+
+    def advance_us(self, us):
+        self.us += int(us)
+
+    def ticks_ms(self):
+        return (self.us // 1000) & TICKS_MAX
+
+    def ticks_us(self):
+        return self.us & TICKS_MAX
+
+    def ticks_diff(self, end, start):
+        return ((end - start + TICKS_HALF) & TICKS_MAX) - TICKS_HALF
+
+    def ticks_add(self, ticks, delta):
+        return (ticks + delta) & TICKS_MAX
+
+    def sleep_ms(self, ms):
+        self.advance(ms)
+
+    def sleep_us(self, us):
+        self.advance_us(us)
+
+
+clock = Clock()
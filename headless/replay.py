@@ -0,0 +1,111 @@
+import argparse
+import hashlib
+import subprocess
+import sys
+import time
+
+from headless import install
+from headless.clock import clock
+
+thumby = install()
+
+import global_store
+from game import GameState
+from loop import MainLoop
+from recorder import Recorder
+from rng import Streams
+from storage import Storage
+from systems import Input
+from ui.screens import TitleScreen
+
+
+BUTTONS = (
+    (Input.UP, "U"),
+    (Input.DOWN, "D"),
+    (Input.LEFT, "L"),
+    (Input.RIGHT, "R"),
+    (Input.A, "A"),
+    (Input.B, "B"),
+)
+
+
+def restore_storage(save, journal):
+    Storage.delete()
+    Storage.make_directory()
+    for path, data in ((Storage.path(), save), (Storage.journal_path(), journal)):
+        if data:
+            with open(path, "wb") as fh:
+                fh.write(data)
+
+
+def digest(gs):
+    state = hashlib.sha1(bytes(thumby.display.display.buffer))
+    state.update(type(gs.screen).__name__.encode())
+    for field in gs._get_save_fields():
+        state.update(repr(getattr(gs, field)).encode())
+    return state.hexdigest()[:12]
+
+
+def replay(path, frames=None):
+    seed, start, save, journal, runs = Recorder.load(path)
+    restore_storage(save, journal)
+
+    Recorder.enabled = False
+    clock.reset(start * 1000)
+    MainLoop.set_fps(30)
+    Streams.seed(seed)
+    gs = GameState()
+    gs.reset_screen(TitleScreen)
+    MainLoop.start(seed)
+
+    now = start
+    timings = []
+    try:
+        for count, mask, delta in runs:
+            thumby.set_buttons([name for bit, name in BUTTONS if mask & bit])
+            for _ in range(count):
+                if frames is not None and len(timings) >= frames:
+                    raise StopIteration
+                now += delta
+                clock.reset(now * 1000)
+                started = time.perf_counter()
+                MainLoop.frame()
+                timings.append(time.perf_counter() - started)
+    except (StopIteration, thumby.ResetRequested):
+        pass
+    return global_store.game_state, timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded Threk session headlessly")
+    parser.add_argument("path", help="recording to replay")
+    parser.add_argument("--frames", type=int, help="stop after this many frames")
+    parser.add_argument("--slowest", type=int, default=5, help="number of slowest frames to list")
+    parser.add_argument("--verify", action="store_true", help="replay twice and compare the final state")
+    args = parser.parse_args(argv)
+
+    gs, timings = replay(args.path, args.frames)
+    total = sum(timings)
+    final = digest(gs)
+    sys.stdout.write("frames {} total {:.1f}ms avg {:.1f}us state {}\n".format(
+        len(timings), total * 1e3, total * 1e6 / max(1, len(timings)), final
+    ))
+
+    slowest = sorted(range(len(timings)), key=lambda idx: timings[idx], reverse=True)[:args.slowest]
+    for idx in slowest:
+        sys.stdout.write("frame {:>6} {:>9.1f}us\n".format(idx, timings[idx] * 1e6))
+
+    if args.verify:
+        command = [sys.executable, "-m", "headless.replay", args.path, "--slowest", "0"]
+        if args.frames is not None:
+            command += ["--frames", str(args.frames)]
+        output = subprocess.check_output(command).decode()
+        if "state {}".format(final) not in output:
+            sys.stdout.write("MISMATCH {}".format(output))
+            return 1
+        sys.stdout.write("deterministic\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import argparse
+import math
+import sys
+
+from headless import install
+from headless.clock import clock
+
+thumby = install()
+
+from actions import PendingAction
+from game import GameState
+from galaxy import QuadrantTable
+from rng import Streams
+from systems import Message, Timeline
+
+
+def visible(gs):
+    quadrant = gs.current_quadrant
+    return [
+        klingon for klingon in gs.klingons
+        if quadrant.line_of_sight(gs.player_x, gs.player_y, klingon.x, klingon.y)
+    ]
+
+
+def course_to(gs, klingon):
+    angle = math.atan2(klingon.y - gs.player_y, klingon.x - gs.player_x)
+    course = 1.0 - 4.0 * angle / math.pi
+    while course < 1.0:
+        course += 8.0
+    return round(course, 1)
+
+
+def fleet_quadrant(seed, power, shield):
+    Streams.seed(seed)
+    clock.reset()
+    Timeline.fast = True
+    gs = GameState()
+    gs.generate("Fleet")
+
+    galaxy = gs.galaxy
+    row = galaxy.row(gs.player_quadrant_x, gs.player_quadrant_y)
+    galaxy.table.klingons[row] = gs.max_klingons_in_quadrant
+    galaxy.table.set_flag(row, QuadrantTable.VISITED, False)
+    gs.current_quadrant.generate_map()
+    Message.queue.clear()
+
+    ships = len(gs.klingons)
+    exchanges = 0
+    while visible(gs) and not gs.over:
+        if gs.player_shield < shield:
+            gs.set_shield(shield)
+        if gs.over:
+            break
+        if not gs.phasers_damage:
+            gs.shoot_phasers(min(power, gs.player_energy))
+        elif gs.player_torpedoes and not gs.torpedo_damage:
+            gs.launch_torpedo(course_to(gs, visible(gs)[0]))
+        else:
+            break
+        PendingAction.resolve()
+        Message.queue.clear()
+        exchanges += 1
+        if exchanges > 100:
+            break
+    return ships, exchanges, gs
+
+
+def run_fleet(seeds, power, shield, out=sys.stdout):
+    failures = 0
+    out.write("{:>6}{:>7}{:>11}{:>9}{:>9}{:>7}  {}\n".format(
+        "seed", "ships", "exchanges", "energy", "shield", "left", "outcome"
+    ))
+    for seed in seeds:
+        ships, exchanges, gs = fleet_quadrant(seed, power, shield)
+        lost = gs.over
+        if lost:
+            failures += 1
+        if lost:
+            outcome = "LOST"
+        elif visible(gs):
+            outcome = "retreat"
+        elif gs.klingons:
+            outcome = "blocked"
+        else:
+            outcome = "cleared"
+        out.write("{:>6}{:>7}{:>11}{:>9}{:>9}{:>7}  {}\n".format(
+            seed, ships, exchanges, gs.player_energy, gs.player_shield, len(gs.klingons), outcome
+        ))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that a full Fleet quadrant can be survived")
+    parser.add_argument("--seeds", type=int, default=16, help="number of seeds to play")
+    parser.add_argument("--power", type=int, default=400, help="phaser power per volley")
+    parser.add_argument("--shield", type=int, default=500, help="shield level to restore before each volley")
+    args = parser.parse_args(argv)
+
+    failures = run_fleet(range(1, args.seeds + 1), args.power, args.shield)
+    sys.stdout.write("{} of {} seeds lost\n".format(failures, args.seeds))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
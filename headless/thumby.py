@@ -0,0 +1,318 @@
+import json
+import os
+
+from headless.clock import clock
+
+
+WIDTH = 72
+HEIGHT = 40
+PAGES = HEIGHT // 8
+
+
+class SSD1306:
+    SET_COL_ADDR = 0x21
+    SET_PAGE_ADDR = 0x22
+    COLUMN_OFFSET = 28
+
+    def __init__(self):
+        self.buffer = bytearray(WIDTH * PAGES)
+        self.panel = bytearray(WIDTH * PAGES)
+        self.commands = []
+        self.pending = []
+        self.columns = (0, WIDTH - 1)
+        self.pages = (0, PAGES - 1)
+        self.bytes_sent = 0
+        self.transfers = 0
+
+    def write_cmd(self, cmd):
+        self.commands.append(cmd)
+        if self.pending:
+            self.pending.append(cmd)
+            if len(self.pending) == 3:
+                command, start, end = self.pending
+                if command == self.SET_COL_ADDR:
+                    self.columns = (start - self.COLUMN_OFFSET, end - self.COLUMN_OFFSET)
+                else:
+                    self.pages = (start, end)
+                self.pending = []
+        elif cmd in (self.SET_COL_ADDR, self.SET_PAGE_ADDR):
+            self.pending.append(cmd)
+
+    def write_data(self, buf):
+        self.bytes_sent += len(buf)
+        self.transfers += 1
+        column, page = self.columns[0], self.pages[0]
+        for value in bytes(buf):
+            self.panel[page * WIDTH + column] = value
+            column += 1
+            if column > self.columns[1]:
+                column = self.columns[0]
+                page += 1
+                if page > self.pages[1]:
+                    page = self.pages[0]
+
+    def show(self):
+        self.write_cmd(self.SET_COL_ADDR)
+        self.write_cmd(self.COLUMN_OFFSET)
+        self.write_cmd(self.COLUMN_OFFSET + WIDTH - 1)
+        self.write_cmd(self.SET_PAGE_ADDR)
+        self.write_cmd(0)
+        self.write_cmd(PAGES - 1)
+        self.write_data(self.buffer)
+
+    def reset_counters(self):
+        del self.commands[:]
+        self.bytes_sent = 0
+        self.transfers = 0
+
+
+def synthesize_font(width, height):
+    bitmap = bytearray(96 * width)
+    mask = (1 << height) - 1
+    for char in range(1, 96):
+        for column in range(width):
+            bitmap[char * width + column] = ((char * 7 + column * 13) % 255 | 1) & mask
+    return bitmap
+
+
+class Graphics:
+    def __init__(self):
+        self.display = SSD1306()
+        self.width = WIDTH
+        self.height = HEIGHT
+        self.frameRate = 0
+        self.lastUpdateEnd = 0
+        self.frames = 0
+        self.calls = 0
+        self.font_loads = 0
+        self.textBitmapSource = None
+        self.textBitmap = bytearray(0)
+        self.font = bytearray(0)
+        self.textWidth = 0
+        self.textHeight = 0
+        self.textSpaceWidth = 0
+
+    def setFPS(self, fps):
+        self.frameRate = fps
+
+    def update(self):
+        self.display.show()
+        self.frames += 1
+        if self.frameRate > 0:
+            frame_time = 1000 // self.frameRate
+            remaining = frame_time - clock.ticks_diff(clock.ticks_ms(), self.lastUpdateEnd)
+            if remaining > 0:
+                clock.advance(remaining)
+        self.lastUpdateEnd = clock.ticks_ms()
+
+    def setFont(self, fontFile, width, height, space):
+        self.font_loads += 1
+        if os.path.exists(fontFile):
+            with open(fontFile, "rb") as fh:
+                self.font = bytearray(fh.read())
+        else:
+            self.font = synthesize_font(width, height)
+        self.textBitmap = bytearray(width)
+        self.textBitmapSource = fontFile
+        self.textWidth = width
+        self.textHeight = height
+        self.textSpaceWidth = space
+
+    def fill(self, color):
+        self.calls += 1
+        value = 0xFF if color else 0
+        buffer = self.display.buffer
+        for i in range(len(buffer)):
+            buffer[i] = value
+
+    def setPixel(self, x, y, color):
+        self.calls += 1
+        self._pixel(x, y, color)
+
+    def _pixel(self, x, y, color):
+        if x < 0 or x >= WIDTH or y < 0 or y >= HEIGHT:
+            return
+        index = (y >> 3) * WIDTH + x
+        if color:
+            self.display.buffer[index] |= 1 << (y & 7)
+        else:
+            self.display.buffer[index] &= ~(1 << (y & 7)) & 0xFF
+
+    def getPixel(self, x, y):
+        if x < 0 or x >= WIDTH or y < 0 or y >= HEIGHT:
+            return 0
+        return (self.display.buffer[(y >> 3) * WIDTH + x] >> (y & 7)) & 1
+
+    def drawLine(self, x0, y0, x1, y1, color):
+        self.calls += 1
+        dx = abs(x1 - x0)
+        sx = 1 if x0 < x1 else -1
+        dy = -abs(y1 - y0)
+        sy = 1 if y0 < y1 else -1
+        error = dx + dy
+        while True:
+            self._pixel(x0, y0, color)
+            if x0 == x1 and y0 == y1:
+                break
+            e2 = 2 * error
+            if e2 >= dy:
+                error += dy
+                x0 += sx
+            if e2 <= dx:
+                error += dx
+                y0 += sy
+
+    def drawFilledRectangle(self, x, y, width, height, color):
+        self.calls += 1
+        for py in range(max(0, y), min(HEIGHT, y + height)):
+            for px in range(max(0, x), min(WIDTH, x + width)):
+                self._pixel(px, py, color)
+
+    def drawRectangle(self, x, y, width, height, color):
+        self.calls += 1
+        for px in range(x, x + width):
+            self._pixel(px, y, color)
+            self._pixel(px, y + height - 1, color)
+        for py in range(y, y + height):
+            self._pixel(x, py, color)
+            self._pixel(x + width - 1, py, color)
+
+    def blit(self, inBuf, x, y, width, height, key, mirrorX, mirrorY):
+        self.calls += 1
+        self._blit(inBuf, x, y, width, height, key, mirrorX, mirrorY)
+
+    def _blit(self, inBuf, x, y, width, height, key, mirrorX, mirrorY):
+        for sy in range(height):
+            py = y + (height - 1 - sy if mirrorY else sy)
+            if py < 0 or py >= HEIGHT:
+                continue
+            row = (sy >> 3) * width
+            bit = sy & 7
+            for sx in range(width):
+                px = x + (width - 1 - sx if mirrorX else sx)
+                if px < 0 or px >= WIDTH:
+                    continue
+                value = (inBuf[row + sx] >> bit) & 1
+                if value != key:
+                    self._pixel(px, py, value)
+
+    def drawSprite(self, sprite):
+        self.calls += 1
+        self._blit(sprite.bitmap, sprite.x, sprite.y, sprite.width, sprite.height, sprite.key, sprite.mirrorX, sprite.mirrorY)
+
+    def drawText(self, string, x, y, color):
+        self.calls += 1
+        bitmap = self.font
+        width = self.textWidth
+        for char in string:
+            code = ord(char) - 0x20
+            if 0 <= code < len(bitmap) // max(1, width):
+                offset = code * width
+                for column in range(width):
+                    value = bitmap[offset + column]
+                    for row in range(self.textHeight):
+                        if (value >> row) & 1:
+                            self._pixel(x + column, y + row, color)
+            x += width + self.textSpaceWidth
+
+
+class Button:
+    def __init__(self, name):
+        self.name = name
+        self.down = False
+        self.last_state = False
+
+    def pressed(self):
+        return self.down
+
+    def justPressed(self):
+        state = self.down
+        just = state and not self.last_state
+        self.last_state = state
+        return just
+
+
+class Audio:
+    def __init__(self):
+        self.played = []
+
+    def play(self, freq, duration):
+        self.played.append((clock.ticks_ms(), freq, duration))
+
+    def playBlocking(self, freq, duration):
+        self.play(freq, duration)
+        clock.advance(duration)
+
+    def stop(self):
+        pass
+
+    def set_enabled(self, setting=True):
+        pass
+
+
+class SaveData:
+    def __init__(self):
+        self.name = None
+        self.items = {}
+        self.blob = None
+        self.writes = 0
+
+    def setName(self, subdir):
+        self.name = subdir
+
+    def setItem(self, key, value):
+        self.items[key] = value
+
+    def getItem(self, key):
+        return self.items[key]
+
+    def hasItem(self, key):
+        return key in self.items
+
+    def delItem(self, key):
+        self.items.pop(key, None)
+
+    def save(self):
+        self.blob = json.dumps(self.items)
+        self.items = json.loads(self.blob)
+        self.writes += 1
+
+
+class ResetRequested(Exception):
+    pass
+
+
+display = Graphics()
+buttonA = Button("A")
+buttonB = Button("B")
+buttonU = Button("U")
+buttonD = Button("D")
+buttonL = Button("L")
+buttonR = Button("R")
+buttons = (buttonU, buttonD, buttonL, buttonR, buttonA, buttonB)
+audio = Audio()
+saveData = SaveData()
+
+
+def inputPressed():
+    for button in buttons:
+        if button.pressed():
+            return True
+    return False
+
+
+def inputJustPressed():
+    just = False
+    for button in buttons:
+        if button.justPressed():
+            just = True
+    return just
+
+
+def set_buttons(names):
+    for button in buttons:
+        button.down = button.name in names
+
+
+def reset():
+    raise ResetRequested()
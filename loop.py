@@ -0,0 +1,127 @@
+import time
+
+import global_store
+from actions import PendingAction
+from display import Display
+from storage import Storage
+from profiler import Profiler
+from recorder import Recorder
+from systems import Sound, Timeline, Input
+from ui.screens import MainScreen
+
+
+class MainLoop:
+    frame_time = 1000 // 30
+    idle_frame_time = 250
+    idle_delay = 2000
+    poll_time = 10
+    duty_window = 1000
+
+    idle = False
+    frame_started = 0
+    last_time = 0
+    last_active = 0
+
+    busy_us = 0
+    window_started = 0
+    duty = 0
+
+    @classmethod
+    def set_fps(cls, fps):
+        cls.frame_time = 1000 // fps
+
+    @classmethod
+    def start(cls, seed=0):
+        cls.frame_started = time.ticks_ms()
+        cls.last_time = cls.frame_started
+        cls.last_active = cls.frame_started
+        cls.window_started = time.ticks_us()
+        global_store.current_time = cls.frame_started
+        if Recorder.enabled:
+            Recorder.start(seed, cls.frame_started)
+
+    @classmethod
+    def wake(cls):
+        cls.idle = False
+        cls.last_active = time.ticks_ms()
+
+    @classmethod
+    def frame(cls):
+        Profiler.begin()
+        started_us = time.ticks_us()
+        gs = global_store.game_state
+
+        cls.frame_started = time.ticks_ms()
+        global_store.current_time = cls.frame_started
+        global_store.delta = time.ticks_diff(cls.frame_started, cls.last_time)
+        cls.last_time = cls.frame_started
+
+        active = Input.sample(cls.frame_started) != 0
+        if Recorder.recording:
+            Recorder.frame(Input.state, global_store.delta)
+        if PendingAction.queue:
+            PendingAction.resolve()
+            gs.end_turn()
+            active = True
+
+        if Timeline.events and type(gs.screen) == MainScreen:
+            Timeline.process(global_store.delta)
+            active = True
+        else:
+            gs.screen.process()
+        Profiler.mark(Profiler.PROCESS)
+
+        gs.screen.draw()
+        Profiler.mark(Profiler.DRAW)
+        Profiler.draw()
+
+        if Display.update():
+            active = True
+        Profiler.mark(Profiler.UPDATE)
+
+        Sound.process(global_store.delta)
+        if Sound.queue or Sound.left:
+            active = True
+        Profiler.mark(Profiler.SOUND)
+
+        if active:
+            cls.wake()
+        elif not cls.idle and time.ticks_diff(cls.frame_started, cls.last_active) >= cls.idle_delay:
+            cls.idle = True
+            Storage.compact()
+            Recorder.sync()
+
+        cls.measure(time.ticks_diff(time.ticks_us(), started_us))
+        cls.sleep()
+
+    @classmethod
+    def sleep(cls):
+        frame_time = cls.idle_frame_time if cls.idle else cls.frame_time
+        deadline = time.ticks_add(cls.frame_started, frame_time)
+        remaining = time.ticks_diff(deadline, time.ticks_ms())
+        while remaining > 0:
+            if cls.idle:
+                if Input.read():
+                    cls.wake()
+                    return
+                time.sleep_ms(min(remaining, cls.poll_time))
+            else:
+                time.sleep_ms(remaining)
+            remaining = time.ticks_diff(deadline, time.ticks_ms())
+
+    @classmethod
+    def measure(cls, busy):
+        cls.busy_us += busy
+        now = time.ticks_us()
+        elapsed = time.ticks_diff(now, cls.window_started)
+        if elapsed >= cls.duty_window * 1000:
+            cls.duty = cls.busy_us * 100 // elapsed
+            Profiler.duty = cls.duty
+            cls.busy_us = 0
+            cls.window_started = now
+
+    @classmethod
+    def run(cls, seed=0):
+        cls.start(seed)
+        while True:
+            cls.frame()
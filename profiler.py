@@ -0,0 +1,132 @@
+import time
+from array import array
+
+import thumby
+
+import utils
+
+
+SAMPLES = 64
+
+class Profiler:
+    PROCESS = 0
+    DRAW = 1
+    UPDATE = 2
+    SOUND = 3
+    FRAME = 4
+
+    # Profiler.timed only wraps functions when instrument is set before the
+    # decorated modules are imported
+    instrument = False
+    enabled = False
+    size = SAMPLES
+    refresh_frames = 15
+
+    names = ["P", "D", "U", "S", "F"]
+    samples = [array("I", bytearray(4 * SAMPLES)) for _ in range(5)]
+    positions = bytearray(5)
+    counts = bytearray(5)
+
+    frame_started = 0
+    phase_started = 0
+    frames = 0
+    duty = 0
+    lines = ["", ""]
+
+    @classmethod
+    def enable(cls, enabled=True):
+        cls.enabled = enabled
+        for slot in range(len(cls.counts)):
+            cls.counts[slot] = 0
+            cls.positions[slot] = 0
+        cls.frame_started = 0
+        cls.phase_started = time.ticks_us()
+        cls.frames = 0
+
+    @classmethod
+    def record(cls, slot, elapsed):
+        position = cls.positions[slot]
+        cls.samples[slot][position] = elapsed
+        cls.positions[slot] = (position + 1) % cls.size
+        if cls.counts[slot] < cls.size:
+            cls.counts[slot] += 1
+
+    @classmethod
+    def begin(cls):
+        if not cls.enabled:
+            return
+
+        now = time.ticks_us()
+        if cls.frame_started:
+            cls.record(cls.FRAME, time.ticks_diff(now, cls.frame_started))
+        cls.frame_started = now
+        cls.phase_started = now
+
+    @classmethod
+    def mark(cls, phase):
+        if not cls.enabled:
+            return
+
+        now = time.ticks_us()
+        cls.record(phase, time.ticks_diff(now, cls.phase_started))
+        cls.phase_started = now
+
+    @classmethod
+    def stats(cls, slot):
+        count = cls.counts[slot]
+        if not count:
+            return 0, 0, 0
+
+        values = sorted(cls.samples[slot][:count])
+        return values[0], sum(values) // count, values[min(count - 1, count * 99 // 100)]
+
+    @classmethod
+    def timed(cls, name):
+        def decorator(func):
+            if not cls.instrument:
+                return func
+
+            slot = len(cls.names)
+            cls.names.append(name)
+            cls.samples.append(array("I", bytearray(4 * cls.size)))
+            cls.positions.append(0)
+            cls.counts.append(0)
+
+            def wrapper(*args, **kwargs):
+                if not cls.enabled:
+                    return func(*args, **kwargs)
+
+                started = time.ticks_us()
+                result = func(*args, **kwargs)
+                cls.record(slot, time.ticks_diff(time.ticks_us(), started))
+                return result
+            return wrapper
+        return decorator
+
+    @classmethod
+    def draw(cls):
+        if not cls.enabled:
+            return
+
+        if cls.frames % cls.refresh_frames == 0:
+            frame = cls.stats(cls.FRAME)
+            cls.lines[0] = "F{} {}/{}ms C{}%".format(
+                1000000 // frame[1] if frame[1] else 0,
+                frame[1] // 1000,
+                frame[2] // 1000,
+                cls.duty
+            )
+            cls.lines[1] = " ".join(
+                "{}{}".format(cls.names[slot], cls.stats(slot)[1] // 1000)
+                for slot in range(cls.FRAME)
+            )
+        cls.frames += 1
+
+        previous_font = utils.font_size
+        utils.set_font(1)
+        thumby.display.drawFilledRectangle(0, 28, 72, 12, 0)
+        utils.draw_text(cls.lines[0], 0, 28, 1)
+        utils.draw_text(cls.lines[1], 0, 34, 1)
+        if previous_font:
+            utils.set_font(previous_font)
+        cls.phase_started = time.ticks_us()
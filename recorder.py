@@ -0,0 +1,127 @@
+import struct
+
+import thumby
+
+from storage import Storage
+
+
+HEADER = "<4sBIIII"
+HEADER_SIZE = struct.calcsize(HEADER)
+RUN = "<BBH"
+RUN_SIZE = struct.calcsize(RUN)
+
+
+class Recorder:
+    MAGIC = b"TREC"
+    VERSION = 2
+    MAX_RUN = 255
+
+    enabled = False
+    recording = False
+    filename = "threk.rec"
+    flush_size = 64 * RUN_SIZE
+
+    runs = bytearray()
+    mask = 0
+    delta = 0
+    count = 0
+
+    @classmethod
+    def path(cls):
+        return Storage.directory + "/" + cls.filename
+
+    @classmethod
+    def load_setting(cls):
+        cls.enabled = thumby.saveData.hasItem("record") and thumby.saveData.getItem("record")
+
+    @classmethod
+    def enable(cls, enabled=True):
+        cls.enabled = enabled
+        thumby.saveData.setItem("record", enabled)
+        thumby.saveData.save()
+        if not enabled:
+            cls.stop()
+
+    @classmethod
+    def read_file(cls, path):
+        if not Storage.exists(path):
+            return b""
+        with open(path, "rb") as fh:
+            return fh.read()
+
+    @classmethod
+    def start(cls, seed, now):
+        save = cls.read_file(Storage.path())
+        journal = cls.read_file(Storage.journal_path())
+
+        Storage.make_directory()
+        with open(cls.path(), "wb") as fh:
+            fh.write(struct.pack(HEADER, cls.MAGIC, cls.VERSION, seed, now, len(save), len(journal)))
+            fh.write(save)
+            fh.write(journal)
+
+        cls.runs = bytearray()
+        cls.count = 0
+        cls.recording = True
+
+    @classmethod
+    def frame(cls, mask, delta):
+        if cls.count and mask == cls.mask and delta == cls.delta and cls.count < cls.MAX_RUN:
+            cls.count += 1
+            return
+
+        cls.emit()
+        cls.mask = mask
+        cls.delta = delta
+        cls.count = 1
+
+    @classmethod
+    def emit(cls):
+        if not cls.count:
+            return
+
+        cls.runs.extend(struct.pack(RUN, cls.count, cls.mask, min(cls.delta, 0xFFFF)))
+        cls.count = 0
+        if len(cls.runs) >= cls.flush_size:
+            cls.flush()
+
+    @classmethod
+    def flush(cls):
+        if not cls.recording or not cls.runs:
+            return
+
+        with open(cls.path(), "ab") as fh:
+            fh.write(cls.runs)
+        cls.runs = bytearray()
+
+    @classmethod
+    def sync(cls):
+        cls.emit()
+        cls.flush()
+
+    @classmethod
+    def stop(cls):
+        cls.sync()
+        cls.recording = False
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as fh:
+            data = fh.read()
+        view = memoryview(data)
+
+        magic, version, seed, start, save_size, journal_size = struct.unpack_from(HEADER, view, 0)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError("not a Threk recording")
+
+        offset = HEADER_SIZE
+        save = bytes(view[offset:offset + save_size])
+        offset += save_size
+        journal = bytes(view[offset:offset + journal_size])
+        offset += journal_size
+
+        runs = []
+        while offset + RUN_SIZE <= len(data):
+            runs.append(struct.unpack_from(RUN, view, offset))
+            offset += RUN_SIZE
+        return seed, start, save, journal, runs
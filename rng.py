@@ -0,0 +1,67 @@
+def mix32(value):
+    value &= 0xFFFFFFFF
+    value ^= value >> 16
+    value = (value * 0x7FEB352D) & 0xFFFFFFFF
+    value ^= value >> 15
+    value = (value * 0x846CA68B) & 0xFFFFFFFF
+    value ^= value >> 16
+    return value
+
+
+class Random:
+    def __init__(self, seed=0):
+        self.hi = 0
+        self.lo = 0
+        self.seed(seed)
+
+    def seed(self, seed):
+        self.set_state(mix32(seed))
+
+    def get_state(self):
+        return (self.hi << 16) | self.lo
+
+    def set_state(self, state):
+        state = state or 0x6D2B79F5
+        self.hi = (state >> 16) & 0xFFFF
+        self.lo = state & 0xFFFF
+
+    def bits(self):
+        hi = self.hi
+        lo = self.lo
+        hi ^= ((hi << 13) | (lo >> 3)) & 0xFFFF
+        lo ^= (lo << 13) & 0xFFFF
+        lo ^= hi >> 1
+        hi ^= ((hi << 5) | (lo >> 11)) & 0xFFFF
+        lo ^= (lo << 5) & 0xFFFF
+        self.hi = hi
+        self.lo = lo
+        return (hi << 14) | (lo >> 2)
+
+    def randint(self, a, b):
+        return a + self.bits() % (b - a + 1)
+
+    def random(self):
+        return self.bits() / 1073741824.0
+
+
+class Streams:
+    galaxy = Random(1)
+    layout = Random(2)
+    combat = Random(3)
+    damage = Random(4)
+
+    SAVED = ("galaxy", "combat", "damage")
+
+    @classmethod
+    def seed(cls, seed):
+        for index, name in enumerate(cls.SAVED):
+            getattr(cls, name).seed(seed + index * 0x9E3779B9)
+
+    @classmethod
+    def get_state(cls):
+        return [getattr(cls, name).get_state() for name in cls.SAVED]
+
+    @classmethod
+    def set_state(cls, states):
+        for name, state in zip(cls.SAVED, states):
+            getattr(cls, name).set_state(state)
@@ -1,3 +1,6 @@
+# BITMAP: width: 5, height: 5
+empty = bytearray([0,0,4,0,0])
+
 # BITMAP: width: 5, height: 5
 player = bytearray([0,27,15,27,0])
 
@@ -0,0 +1,334 @@
+import os
+import struct
+from array import array
+
+from galaxy import Galaxy, LazyGalaxy, QuadrantTable
+from rng import Streams
+
+
+HEADER = "<4sBBHHIIIB"
+HEADER_SIZE = struct.calcsize(HEADER)
+
+FIELDS = (
+    ("max_player_energy", "H", 1),
+    ("player_energy", "H", 1),
+    ("player_shield", "H", 1),
+    ("player_torpedoes", "B", 1),
+    ("player_quadrant_x", "H", 1),
+    ("player_quadrant_y", "H", 1),
+    ("player_x", "B", 1),
+    ("player_y", "B", 1),
+    ("navigation_damage", "B", 1),
+    ("lrs_damage", "B", 1),
+    ("torpedo_damage", "B", 1),
+    ("phasers_damage", "B", 1),
+    ("shield_damage", "B", 1),
+    ("starbases_left", "b", 1),
+    ("time_remaining", "h", 1),
+    ("is_docked", "B", 1),
+    ("klingons_remaining", "H", 1),
+    ("klingon_strength", "B", 1),
+    ("last_nav_course", "B", 10),
+    ("last_torpedo_course", "B", 10),
+)
+FIELDS_FORMAT = "<" + "".join(field[1] for field in FIELDS)
+FIELDS_SIZE = struct.calcsize(FIELDS_FORMAT)
+
+STREAMS_FORMAT = "<{}I".format(len(Streams.SAVED))
+STREAMS_SIZE = struct.calcsize(STREAMS_FORMAT)
+TABLE_OFFSET = HEADER_SIZE + FIELDS_SIZE + STREAMS_SIZE
+
+RECORD = "<BIH"
+RECORD_SIZE = struct.calcsize(RECORD)
+SPAN = "<IH"
+SPAN_SIZE = struct.calcsize(SPAN)
+
+
+def checksum(data):
+    total = 0
+    for value in data:
+        total += value
+    return total & 0xFF
+
+
+class Storage:
+    MAGIC = b"THRK"
+    VERSION = 5
+    RECORD_MARKER = 0x4A
+    BLOCK = 32
+    CAPACITY_STEP = 64
+    JOURNAL_LIMIT = 2048
+
+    directory = "/Saves/Threk"
+    filename = "threk.sav"
+    journal_filename = "threk.jnl"
+    temp_filename = "threk.tmp"
+
+    snapshot = None
+    image = None
+    journal_size = 0
+    writes = 0
+    bytes_written = 0
+
+    @classmethod
+    def path(cls):
+        return cls.directory + "/" + cls.filename
+
+    @classmethod
+    def journal_path(cls):
+        return cls.directory + "/" + cls.journal_filename
+
+    @classmethod
+    def temp_path(cls):
+        return cls.directory + "/" + cls.temp_filename
+
+    @classmethod
+    def exists(cls, path):
+        try:
+            os.stat(path)
+            return True
+        except OSError:
+            return False
+
+    @classmethod
+    def has_save(cls):
+        return cls.exists(cls.path())
+
+    @classmethod
+    def remove(cls, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @classmethod
+    def delete(cls):
+        cls.snapshot = None
+        cls.image = None
+        cls.journal_size = 0
+        cls.remove(cls.journal_path())
+        cls.remove(cls.temp_path())
+        cls.remove(cls.path())
+
+    @classmethod
+    def make_directory(cls):
+        path = ""
+        for part in cls.directory.split("/"):
+            if not part:
+                continue
+            path += "/" + part
+            try:
+                os.mkdir(path)
+            except OSError:
+                pass
+
+    @classmethod
+    def pack(cls, gs):
+        galaxy = gs.galaxy
+        table = galaxy.table
+        rows = len(table)
+        lazy = galaxy.lazy
+        capacity = -(-rows // cls.CAPACITY_STEP) * cls.CAPACITY_STEP if lazy else rows
+
+        slots = table.slots
+        row_size = 15 + 3 * slots + (4 if lazy else 0)
+        image = bytearray(TABLE_OFFSET + capacity * row_size)
+        struct.pack_into(
+            HEADER, image, 0,
+            cls.MAGIC, cls.VERSION, lazy, galaxy.w, galaxy.h, galaxy.seed if lazy else 0, rows, capacity, slots
+        )
+        struct.pack_into(
+            FIELDS_FORMAT, image, HEADER_SIZE,
+            *[int(round(getattr(gs, name) * scale)) for name, _, scale in FIELDS]
+        )
+        struct.pack_into(STREAMS_FORMAT, image, HEADER_SIZE + FIELDS_SIZE, *Streams.get_state())
+
+        offset = TABLE_OFFSET
+        struct.pack_into("<{}I".format(rows), image, offset, *table.seeds)
+        offset += 4 * capacity
+        for column in (table.stars, table.klingons, table.flags):
+            image[offset:offset + rows] = column
+            offset += capacity
+        image[offset:offset + 8 * rows] = table.destroyed
+        offset += 8 * capacity
+        image[offset:offset + slots * rows] = table.fleet
+        offset += slots * capacity
+        struct.pack_into("<{}H".format(slots * rows), image, offset, *table.shields)
+        offset += 2 * slots * capacity
+        if lazy:
+            struct.pack_into("<{}I".format(rows), image, offset, *galaxy.indexes)
+        return image
+
+    @classmethod
+    def changed_blocks(cls, image, previous):
+        block = cls.BLOCK
+        start = -1
+        for offset in range(0, len(image) + block, block):
+            if offset < len(image) and image[offset:offset + block] != previous[offset:offset + block]:
+                if start < 0:
+                    start = offset
+            elif start >= 0:
+                yield start, min(offset, len(image))
+                start = -1
+
+    @classmethod
+    def changed_spans(cls, image, previous):
+        size = len(previous)
+        for start, end in cls.changed_blocks(image, previous):
+            while start < min(end, size) and image[start] == previous[start]:
+                start += 1
+            while end > start and end <= size and image[end - 1] == previous[end - 1]:
+                end -= 1
+            if start < end:
+                yield start, end
+
+    @classmethod
+    def write_snapshot(cls, image):
+        previous = cls.snapshot
+        cls.writes += 1
+
+        if previous is None or len(previous) != len(image) or not cls.has_save():
+            cls.make_directory()
+            with open(cls.temp_path(), "wb") as fh:
+                fh.write(image)
+            try:
+                os.rename(cls.temp_path(), cls.path())
+            except OSError:
+                cls.remove(cls.path())
+                os.rename(cls.temp_path(), cls.path())
+            cls.bytes_written += len(image)
+        else:
+            view = memoryview(image)
+            with open(cls.path(), "r+b") as fh:
+                for start, end in cls.changed_blocks(image, previous):
+                    fh.seek(start)
+                    fh.write(view[start:end])
+                    cls.bytes_written += end - start
+
+        cls.snapshot = image
+        cls.image = image
+        cls.journal_size = 0
+        cls.remove(cls.journal_path())
+
+    @classmethod
+    def save(cls, gs):
+        cls.write_snapshot(cls.pack(gs))
+
+    @classmethod
+    def commit(cls, gs):
+        image = cls.pack(gs)
+        previous = cls.image
+        if previous is None or len(image) != len(previous) or not cls.has_save():
+            cls.write_snapshot(image)
+            return
+
+        spans = list(cls.changed_spans(image, previous))
+        if not spans:
+            return
+
+        record = bytearray(RECORD_SIZE + sum(SPAN_SIZE + end - start for start, end in spans) + 1)
+        struct.pack_into(RECORD, record, 0, cls.RECORD_MARKER, len(image), len(spans))
+        offset = RECORD_SIZE
+        for start, end in spans:
+            struct.pack_into(SPAN, record, offset, start, end - start)
+            offset += SPAN_SIZE
+            record[offset:offset + end - start] = image[start:end]
+            offset += end - start
+        record[offset] = checksum(record[:offset])
+
+        with open(cls.journal_path(), "ab") as fh:
+            fh.write(record)
+        cls.writes += 1
+        cls.bytes_written += len(record)
+        cls.journal_size += len(record)
+        cls.image = image
+
+        if cls.journal_size > cls.JOURNAL_LIMIT:
+            cls.compact()
+
+    @classmethod
+    def compact(cls):
+        if cls.image is not None and (cls.journal_size or cls.exists(cls.journal_path())):
+            cls.write_snapshot(cls.image)
+
+    @classmethod
+    def replay(cls, image):
+        if not cls.exists(cls.journal_path()):
+            return image, 0, True
+
+        with open(cls.journal_path(), "rb") as fh:
+            journal = memoryview(fh.read())
+
+        position = 0
+        while position + RECORD_SIZE <= len(journal):
+            marker, size, count = struct.unpack_from(RECORD, journal, position)
+            if marker != cls.RECORD_MARKER or size != len(image):
+                break
+
+            offset = position + RECORD_SIZE
+            spans = []
+            for _ in range(count):
+                if offset + SPAN_SIZE > len(journal):
+                    break
+                start, length = struct.unpack_from(SPAN, journal, offset)
+                offset += SPAN_SIZE
+                spans.append((start, offset, length))
+                offset += length
+
+            if offset >= len(journal) or journal[offset] != checksum(journal[position:offset]):
+                break
+
+            for start, source, length in spans:
+                image[start:start + length] = journal[source:source + length]
+            position = offset + 1
+        return image, position, position == len(journal)
+
+    @classmethod
+    def load(cls, gs):
+        with open(cls.path(), "rb") as fh:
+            snapshot = bytearray(fh.read())
+        if len(snapshot) < HEADER_SIZE:
+            return None
+
+        image, journal_size, complete = cls.replay(bytearray(snapshot))
+        view = memoryview(image)
+
+        magic, version, lazy, w, h, seed, rows, capacity, slots = struct.unpack_from(HEADER, view, 0)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            return None
+        row_size = 15 + 3 * slots + (4 if lazy else 0)
+        if rows > capacity or len(image) < TABLE_OFFSET + capacity * row_size:
+            return None
+
+        values = struct.unpack_from(FIELDS_FORMAT, view, HEADER_SIZE)
+        for (name, _, scale), value in zip(FIELDS, values):
+            setattr(gs, name, value / scale if scale != 1 else value)
+        Streams.set_state(struct.unpack_from(STREAMS_FORMAT, view, HEADER_SIZE + FIELDS_SIZE))
+
+        table = QuadrantTable(slots=slots)
+        offset = TABLE_OFFSET
+        table.seeds = array("I", struct.unpack_from("<{}I".format(rows), view, offset))
+        offset += 4 * capacity
+        table.stars = bytearray(view[offset:offset + rows])
+        offset += capacity
+        table.klingons = bytearray(view[offset:offset + rows])
+        offset += capacity
+        table.flags = bytearray(view[offset:offset + rows])
+        offset += capacity
+        table.destroyed = bytearray(view[offset:offset + 8 * rows])
+        offset += 8 * capacity
+        table.fleet = bytearray(view[offset:offset + slots * rows])
+        offset += slots * capacity
+        table.shields = array("H", struct.unpack_from("<{}H".format(slots * rows), view, offset))
+        offset += 2 * slots * capacity
+
+        cls.snapshot = snapshot
+        cls.image = image
+        cls.journal_size = journal_size
+        if not complete:
+            cls.compact()
+
+        if lazy:
+            indexes = array("I", struct.unpack_from("<{}I".format(rows), view, offset))
+            return LazyGalaxy(w, h, seed, table, indexes)
+        return Galaxy(w, h, table)
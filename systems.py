@@ -1,3 +1,4 @@
+import time
 import thumby
 
 import global_store
@@ -51,3 +52,121 @@ class Message:
     @classmethod
     def show(cls, text):
         cls.queue.append(text)
+
+
+class Timeline:
+    fast = False
+    recording = False
+    now = 0
+    elapsed = 0
+    position = 0
+    events = []
+
+    @classmethod
+    def call(cls, func, *args):
+        if cls.recording:
+            cls.events.append((cls.now, func, args))
+        else:
+            func(*args)
+
+    @classmethod
+    def start(cls):
+        cls.recording = not cls.fast
+        cls.now = 0
+
+    @classmethod
+    def stop(cls):
+        cls.recording = False
+
+    @classmethod
+    def process(cls, delta):
+        cls.elapsed += delta
+        events = cls.events
+        while cls.position < len(events) and events[cls.position][0] <= cls.elapsed:
+            _, func, args = events[cls.position]
+            cls.position += 1
+            func(*args)
+
+        if cls.position >= len(events):
+            cls.clear()
+
+    @classmethod
+    def clear(cls):
+        cls.events.clear()
+        cls.position = 0
+        cls.elapsed = 0
+
+
+class Input:
+    UP = 1
+    DOWN = 2
+    LEFT = 4
+    RIGHT = 8
+    A = 16
+    B = 32
+    DPAD = UP | DOWN | LEFT | RIGHT
+
+    repeat_delay = 300
+    repeat_interval = 100
+    repeat_factor = 0.8
+    tap_window = 500
+
+    state = 0
+    pressed = 0
+    released = 0
+    repeated = 0
+
+    repeats = 0
+    next_repeat = 0
+    interval = 0
+
+    taps = 0
+    last_tap = 0
+    last_tap_at = 0
+
+    @classmethod
+    def read(cls):
+        state = 0
+        if thumby.buttonU.pressed():
+            state |= cls.UP
+        if thumby.buttonD.pressed():
+            state |= cls.DOWN
+        if thumby.buttonL.pressed():
+            state |= cls.LEFT
+        if thumby.buttonR.pressed():
+            state |= cls.RIGHT
+        if thumby.buttonA.pressed():
+            state |= cls.A
+        if thumby.buttonB.pressed():
+            state |= cls.B
+        return state
+
+    @classmethod
+    def sample(cls, now):
+        state = cls.read()
+        previous = cls.state
+        cls.state = state
+        cls.pressed = state & ~previous
+        cls.released = previous & ~state
+        cls.repeated = 0
+
+        if cls.pressed:
+            if cls.pressed == cls.last_tap and time.ticks_diff(now, cls.last_tap_at) <= cls.tap_window:
+                cls.taps += 1
+            else:
+                cls.taps = 1
+            cls.last_tap = cls.pressed
+            cls.last_tap_at = now
+
+        if cls.pressed & cls.DPAD:
+            cls.repeats = 0
+            cls.interval = cls.repeat_interval
+            cls.next_repeat = time.ticks_add(now, cls.repeat_delay)
+
+        elif state & cls.DPAD and time.ticks_diff(now, cls.next_repeat) >= 0:
+            cls.repeated = state & cls.DPAD
+            cls.repeats += 1
+            cls.next_repeat = time.ticks_add(now, int(cls.interval))
+            cls.interval *= cls.repeat_factor
+
+        return state
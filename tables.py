@@ -0,0 +1,107 @@
+import math
+from array import array
+
+from utils import bresenham, direction_to_angle
+
+
+COURSES = 80
+SECTOR_RANGE = 11.3
+TORPEDO_SPREAD = 2.4
+
+
+def build_falloff():
+    table = array("f", bytearray(4 * 15 * 15))
+    for dy in range(-7, 8):
+        for dx in range(-7, 8):
+            table[(dy + 7) * 15 + dx + 7] = 1.0 - math.sqrt(dx * dx + dy * dy) / SECTOR_RANGE
+    return table
+
+
+FALLOFF = build_falloff()
+
+
+def falloff(x1, y1, x2, y2):
+    return FALLOFF[(y2 - y1 + 7) * 15 + x2 - x1 + 7]
+
+
+def course_index(direction):
+    return (int(round(direction * 10)) - 10) % COURSES
+
+
+def course_angle(course):
+    return direction_to_angle(1.0 + course / 10.0)
+
+
+class Tables:
+    path_limit = 128
+    torpedo_paths = {}
+    warp_paths = {}
+    arrows = {}
+
+    @classmethod
+    def cache_path(cls, paths, key, path):
+        if len(paths) >= cls.path_limit:
+            paths.clear()
+        paths[key] = path
+        return path
+
+    @classmethod
+    def torpedo_path(cls, cell, course):
+        key = cell * COURSES + course
+        path = cls.torpedo_paths.get(key)
+        if path is not None:
+            return path
+
+        angle = course_angle(course)
+        x = cell % 8
+        y = cell // 8
+        path = bytearray()
+        for px, py in bresenham(x, y, x + math.cos(angle) * SECTOR_RANGE, y + math.sin(angle) * SECTOR_RANGE):
+            if px < 0 or py < 0 or px > 7 or py > 7:
+                break
+            path.append(py * 8 + px)
+        return cls.cache_path(cls.torpedo_paths, key, bytes(path))
+
+    @classmethod
+    def warp_path(cls, course, distance):
+        steps = int(round(distance * 10))
+        key = steps * COURSES + course
+        path = cls.warp_paths.get(key)
+        if path is not None:
+            return path
+
+        angle = course_angle(course)
+        dx = round(steps / 10.0 * math.cos(angle))
+        dy = round(steps / 10.0 * math.sin(angle))
+        path = array("b")
+        for px, py in bresenham(0, 0, dx, dy):
+            path.append(px)
+            path.append(py)
+        return cls.cache_path(cls.warp_paths, key, path)
+
+    @classmethod
+    def arrow(cls, course, length, head_angle, head_length):
+        key = (length, head_angle, head_length)
+        points = cls.arrows.get(key)
+        if points is None:
+            points = [None] * COURSES
+            cls.arrows[key] = points
+
+        if points[course] is None:
+            angle = course_angle(course)
+            half_length = length / 2
+            x2 = int(round(half_length * math.cos(angle)))
+            y2 = int(round(half_length * math.sin(angle)))
+            angle1 = angle + math.radians(head_angle)
+            angle2 = angle - math.radians(head_angle)
+            points[course] = (
+                int(round(-half_length * math.cos(angle))),
+                int(round(-half_length * math.sin(angle))),
+                x2,
+                y2,
+                int(round(x2 - head_length * math.cos(angle1))),
+                int(round(y2 - head_length * math.sin(angle1))),
+                int(round(x2 - head_length * math.cos(angle2))),
+                int(round(y2 - head_length * math.sin(angle2))),
+            )
+        return points[course]
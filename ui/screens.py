@@ -1,15 +1,19 @@
 import thumby
 
 import global_store
-from constants import Objects
 import sprites
 from utils import *
-from systems import Sound, Message
+from systems import Sound, Message, Timeline
+from profiler import Profiler
+from ui.widgets import MenuList, Grid
 
 
 class BaseScreen:
     font_size = 1
 
+    def setup(self):
+        pass
+
     def enter(self):
         thumby.display.fill(0)
         set_font(self.font_size)
@@ -26,6 +30,9 @@ class BaseScreen:
 
 class MainScreen(BaseScreen):
     additional_draws = []
+    map_buffer = bytearray(40 * 40 // 8)
+    cell_sprites = (sprites.empty, sprites.player, sprites.klingon, sprites.star, sprites.starbase)
+    changed = True
     sidebar_x = 42
     sidebar_y = 1
 
@@ -33,27 +40,60 @@ class MainScreen(BaseScreen):
         from ui.sidebars import MainSidebar
         self.main_sidebar = MainSidebar(self.sidebar_x, self.sidebar_y)
         self.sidebar = self.main_sidebar
+        self.sidebars = {MainSidebar: self.main_sidebar}
+
+    def setup(self):
+        self.sidebar = self.main_sidebar
+
+    def get_sidebar(self, sidebar_class):
+        sidebar = self.sidebars.get(sidebar_class)
+        if sidebar is None:
+            sidebar = sidebar_class(offset_x=self.sidebar_x, offset_y=self.sidebar_y)
+            self.sidebars[sidebar_class] = sidebar
+        return sidebar
 
     def enter(self):
+        thumby.display.fill(0)
+        self.invalidate()
         self.sidebar.enter()
 
-    @global_store.add_game_state
-    def draw_map(self, gs):
-        thumby.display.drawFilledRectangle(0, 0, 40, 40, 0)
-        quadrant_map = gs.current_quadrant.map
-        for x in range(8):
-            for y in range(8):
-                obj = quadrant_map[y * 8 + x]
-                if obj == Objects.NOTHINGNESS:
-                    thumby.display.setPixel(x * 5 + 2, y * 5 + 2, 1)
-                elif obj == Objects.PLAYER:
-                    blit(sprites.player, x, y)
-                elif obj == Objects.STAR:
-                    blit(sprites.star, x, y)
-                elif obj == Objects.STARBASE:
-                    blit(sprites.starbase, x, y)
-                elif obj == Objects.KLINGON:
-                    blit(sprites.klingon, x, y)
+    @classmethod
+    def invalidate(cls):
+        cls.changed = True
+
+    @classmethod
+    def set_cell(cls, x, y, obj):
+        compose_cell(cls.map_buffer, cls.cell_sprites[obj], x, y)
+        cls.changed = True
+
+    @classmethod
+    def set_map(cls, quadrant_map):
+        for idx in range(64):
+            compose_cell(cls.map_buffer, cls.cell_sprites[quadrant_map[idx]], idx % 8, idx // 8)
+        cls.changed = True
+
+    @classmethod
+    def add_draw(cls, drawable):
+        cls.additional_draws.append(drawable)
+        cls.changed = True
+
+    @classmethod
+    def remove_draw(cls, drawable):
+        cls.additional_draws.remove(drawable)
+        cls.changed = True
+
+    @classmethod
+    def move_sprite(cls, drawable, x, y):
+        drawable[1][1] = x
+        drawable[1][2] = y
+        cls.changed = True
+
+    def draw_map(self):
+        if not MainScreen.changed:
+            return
+
+        MainScreen.changed = False
+        thumby.display.blit(self.map_buffer, 0, 0, 40, 40, -1, 0, 0)
         for drawable in self.additional_draws:
             drawable[0](*drawable[1])
 
@@ -73,7 +113,7 @@ class MainScreen(BaseScreen):
         if sidebar_response is True:
             self.sidebar = self.main_sidebar
         else:
-            self.sidebar = sidebar_response(offset_x=self.sidebar_x, offset_y=self.sidebar_y)
+            self.sidebar = self.get_sidebar(sidebar_response)
 
         self.sidebar.enter()
 
@@ -84,6 +124,10 @@ class BaseMessageScreen(BaseScreen):
         self.changed = True
         self.lines = []
 
+    def enter(self):
+        super().enter()
+        self.changed = True
+
     def draw(self):
         if not self.changed:
             return
@@ -116,59 +160,86 @@ class MessageScreen(BaseMessageScreen):
 
 
 class LRSScreen(BaseScreen):
+    columns = 5
+    rows = 6
+
+    def __init__(self):
+        self.grid = Grid(0, 1, self.columns, self.rows, highlight_height=7, text_y=1)
+
     @global_store.add_game_state
     def process(self, gs):
         if input_a() or input_b():
             gs.pop_screen()
 
+    def enter(self):
+        super().enter()
+        self.update_grid()
+
     @global_store.add_game_state
-    def draw(self, gs):
-        thumby.display.drawFilledRectangle(
-            gs.player_quadrant_x * 15,
-            1 + gs.player_quadrant_y * 6,
-            13, 7, 1
-        )
-
-        for x in range(gs.quadrants_w):
-            for y in range(gs.quadrants_h):
-                quadrant = gs.quadrants[y * gs.quadrants_w + x]
+    def update_grid(self, gs):
+        galaxy = gs.galaxy
+        origin_x = min(max(0, gs.player_quadrant_x - self.columns // 2), galaxy.w - self.columns)
+        origin_y = min(max(0, gs.player_quadrant_y - self.rows // 2), galaxy.h - self.rows)
+        self.grid.set_cursor((gs.player_quadrant_x - origin_x) * self.rows + gs.player_quadrant_y - origin_y)
+
+        labels = []
+        table = galaxy.table
+        for column in range(self.columns):
+            for row in range(self.rows):
+                x = origin_x + column
+                y = origin_y + row
                 if (
                     not gs.lrs_damage and
                     abs(gs.player_quadrant_x - x) <= 1 and abs(gs.player_quadrant_y - y) <= 1
                 ):
-                    quadrant.scanned = True
+                    galaxy.scan(x, y)
 
-                if quadrant.scanned:
+                index = galaxy.row(x, y)
+                if index >= 0 and table.flags[index] & table.SCANNED:
+                    klingons = table.klingons[index]
+                    starbase = table.flags[index] & table.STARBASE
+                    stars = table.stars[index]
                     if gs.lrs_damage:
                         label = "{}{}{}".format(
-                            "+" if quadrant.klingons else "0",
-                            "+" if quadrant.starbase else "0",
-                            "+" if quadrant.stars else "0"
+                            "+" if klingons else "0",
+                            "+" if starbase else "0",
+                            "+" if stars else "0"
                         )
                     else:
                         label = "{:0>3}".format(
-                            quadrant.klingons * 100
-                            + int(quadrant.starbase) * 10
-                            + quadrant.stars
+                            min(klingons, 9) * 100
+                            + int(bool(starbase)) * 10
+                            + stars
                         )
                 else:
                     label = "---"
 
-                draw_text(
-                    label,
-                    1 + x * 15,
-                    2 + y * 6,
-                    int(not(gs.player_quadrant_x == x and gs.player_quadrant_y == y))
-                )
+                labels.append(label)
+        self.grid.set_cells(labels)
+
+    def draw(self):
+        self.grid.draw()
 
 class BaseMenuScreen(BaseScreen):
     def __init__(self):
         self.cursor = 0
-        self.menu = self.get_menu()
+        self.menu_list = MenuList(0, 7, 72)
+
+    def setup(self):
+        self.cursor = 0
+        self.set_menu(self.get_menu())
 
     def get_menu(self):
         raise NotImplementedError
 
+    def set_menu(self, menu):
+        self.menu = menu
+        self.menu_list.set_items(menu)
+
+    def enter(self):
+        super().enter()
+        self.menu_list.invalidate()
+
     def select(self, option):
         raise NotImplementedError
 
@@ -190,24 +261,8 @@ class BaseMenuScreen(BaseScreen):
             self.select(self.menu[self.cursor])
 
     def draw(self):
-        set_font(2)
-        thumby.display.fill(0)
-        start_index = min(max(0, self.cursor - 1), len(self.menu) - 3)
-
-        thumby.display.drawFilledRectangle(
-            0,
-            7 + (self.cursor - start_index) * 10,
-            72,
-            10,
-            1
-        )
-        for idx, line in enumerate(self.menu[start_index:start_index + 3]):
-            draw_text(
-                line,
-                36 - int((len(line) * 6) / 2),
-                8 + idx * 10,
-                0 if (idx + start_index) == self.cursor else 1
-            )
+        self.menu_list.set_cursor(self.cursor)
+        self.menu_list.draw()
 
 
 class ComputerScreen(BaseMenuScreen):
@@ -218,6 +273,7 @@ class ComputerScreen(BaseMenuScreen):
             "Wait",
             "Save",
             "Load",
+            "Options",
             "Quit",
         ]
 
@@ -235,10 +291,36 @@ class ComputerScreen(BaseMenuScreen):
             Message.show("Game saved")
             gs.change_screen(MainScreen)
         elif option == "Load":
-            gs.load()
-            gs.change_screen(MainScreen)
+            if gs.load():
+                gs.reset_screen(MainScreen)
+            else:
+                Message.show("No saved game")
+                gs.pop_screen()
+        elif option == "Options":
+            gs.change_screen(OptionsScreen)
         elif option == "Quit":
-            thumby.reset()
+            gs.quit()
+
+
+class OptionsScreen(BaseMenuScreen):
+    @global_store.add_game_state
+    def get_menu(self, gs):
+        return [
+            "HUD {}".format("on" if Profiler.enabled else "off"),
+            "Anim {}".format("off" if Timeline.fast else "on"),
+            "Rec {}".format("on" if gs.recording() else "off"),
+        ]
+
+    @global_store.add_game_state
+    def select(self, gs, option):
+        if option.startswith("HUD"):
+            Profiler.enable(not Profiler.enabled)
+        elif option.startswith("Anim"):
+            Timeline.fast = not Timeline.fast
+        elif option.startswith("Rec"):
+            gs.toggle_recording()
+        self.set_menu(self.get_menu())
+        self.enter()
 
 
 class StatusScreen(BaseMenuScreen):
@@ -274,28 +356,41 @@ class DamageScreen(BaseMenuScreen):
         gs.pop_screen()
 
 
+class NewGameScreen(BaseMenuScreen):
+    def get_menu(self):
+        return [
+            "Classic",
+            "Large",
+            "Huge",
+            "Fleet",
+        ]
+
+    @global_store.add_game_state
+    def select(self, gs, option):
+        gs.generate(option)
+        gs.reset_screen(MainScreen)
+
+
 class GameOverScreen(BaseMessageScreen):
-    def __init__(self, message):
-        super().__init__()
+    def setup(self, message):
         self.lines = ["Game over"]
         self.lines.extend(message.split('\n'))
-        thumby.saveData.delItem("quadrants")
+        global_store.game_state.delete_save()
 
     @global_store.add_game_state
     def process(self, gs):
         if input_a() or input_b():
-            gs.change_screen(TitleScreen)
+            gs.reset_screen(TitleScreen)
 
 
 class TitleScreen(BaseScreen):
     @global_store.add_game_state
     def process(self, gs):
         if input_a() or input_b():
-            if thumby.saveData.hasItem("quadrants"):
-                gs.load()
+            if gs.has_save() and gs.load():
+                gs.reset_screen(MainScreen)
             else:
-                gs.generate()
-            gs.change_screen(MainScreen)
+                gs.change_screen(NewGameScreen)
 
     def draw(self):
         set_font(2)
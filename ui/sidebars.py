@@ -1,9 +1,9 @@
-import time
 import thumby
 
 from utils import *
 import global_store
 from systems import Message
+from ui.widgets import Label, ValueField, Arrow, Grid, draw_widgets, invalidate_widgets
 
 
 class BaseSidebar:
@@ -12,16 +12,21 @@ class BaseSidebar:
     def __init__(self, offset_x, offset_y):
         self.offset_x = offset_x
         self.offset_y = offset_y
+        self.widgets = self.get_widgets()
+
+    def get_widgets(self):
+        return []
 
     def enter(self):
-        thumby.display.fill(0)
+        self.fill_background()
         set_font(self.font_size)
+        invalidate_widgets(self.widgets)
 
     def exit(self):
         pass
 
     def draw(self):
-        raise NotImplementedError
+        draw_widgets(self.widgets)
 
     def process(self):
         raise NotImplementedError
@@ -31,18 +36,6 @@ class BaseSidebar:
 
 
 class BaseValueSidebar(BaseSidebar):
-    press_wait = 300
-
-    def enter(self):
-        self.press_count = 0
-        self.last_pressed = None
-        self.pressed_at = 0
-        self.current_wait = self.press_wait
-        self.max_wait = self.press_wait
-        self.steps = 0
-        self.changed = True
-        self.drawn_at = 0
-
     def apply(self):
         raise NotImplementedError
 
@@ -54,56 +47,7 @@ class BaseValueSidebar(BaseSidebar):
             self.apply()
             return True
 
-        self.changed = False
-        pressed = input_dpad_just_pressed()
-        delta = time.ticks_diff(global_store.current_time, self.pressed_at)
-        wait_over = False
-
-        if pressed:
-            if pressed == self.last_pressed:
-                self.press_count += 1
-
-            else:
-                self.press_count = 1
-
-            self.last_pressed = pressed
-            self.pressed_at = time.ticks_ms()
-            self.current_wait = self.press_wait
-            self.steps = 1
-
-        else:
-            if delta > 500:
-                self.press_count = 0
-            wait_over = delta >= self.current_wait
-            if wait_over:
-                self.current_wait = self.max_wait
-                self.max_wait *= 0.9
-                self.steps += 1
-
-        self.changed = bool(self.process_change(pressed, wait_over))
-
-    def should_redraw(self):
-        if not self.changed:
-            return False
-
-        if time.ticks_diff(global_store.current_time, self.drawn_at) < 100:
-            return False
-
-        return True
-
-    def fill_background(self):
-        self.drawn_at = global_store.current_time
-        super().fill_background()
-
-    def draw(self):
-        if not self.should_redraw():
-            return
-
-        self.fill_background()
-        set_font(2)
-        self.draw_labels()
-        set_font(3)
-        self.draw_values()
+        self.process_change(input_dpad_just_pressed(), input_dpad_repeated())
 
 
 class BasePowerSidebar(BaseValueSidebar):
@@ -113,25 +57,22 @@ class BasePowerSidebar(BaseValueSidebar):
         super().enter()
         self.power = 0
 
-    def process_change(self, direction, wait_over):
-        if direction == Direction.UP or (wait_over and input_up(False)):
-            self.power += min(self.steps, 50)
+    def process_change(self, direction, repeated):
+        if direction == Direction.UP or repeated == Direction.UP:
+            self.power += min(Input.repeats + 1, 50)
             return True
 
-        if direction == Direction.DOWN or (wait_over and input_down(False)):
-            self.power -= min(self.steps, 50)
+        if direction == Direction.DOWN or repeated == Direction.DOWN:
+            self.power -= min(Input.repeats + 1, 50)
             if self.power < 0:
                 self.power = 0
             return True
 
-    def draw(self):
-        if not self.should_redraw():
-            return
-
-        self.fill_background()
-        set_font(2)
-        draw_text("Power", self.offset_x, self.offset_y, 1)
-        draw_text(str(self.power), self.offset_x, self.offset_y + 8, 1)
+    def get_widgets(self):
+        return [
+            Label(self.offset_x, self.offset_y, 30, 8, "Power", 2),
+            ValueField(self.offset_x, self.offset_y + 8, 30, 8, self, "power", font=2),
+        ]
 
 
 class ShieldSidebar(BasePowerSidebar):
@@ -161,28 +102,31 @@ class BaseCourseSidebar(BaseValueSidebar):
             return result
         self.direction = round(self.direction, 1)
 
-    def process_change(self, direction, wait_over):
-        if direction == Direction.LEFT or (wait_over and input_left(False)):
+    def process_change(self, direction, repeated):
+        if direction == Direction.LEFT or repeated == Direction.LEFT:
             self.direction += 0.1
-            if direction and self.press_count >= 2:
+            if direction and Input.taps >= 2:
                 self.direction = float(math.ceil(self.direction))
             if self.direction > 8.9:
                 self.direction = 1.0
             return True
 
-        if direction == Direction.RIGHT or (wait_over and input_right(False)):
+        if direction == Direction.RIGHT or repeated == Direction.RIGHT:
             self.direction -= 0.1
-            if direction and self.press_count >= 2:
+            if direction and Input.taps >= 2:
                 self.direction = float(math.floor(self.direction))
             if self.direction < 1.0:
                 self.direction = 8.9
             return True
 
-    def draw_labels(self):
-        draw_text("Dir", self.offset_x, self.offset_y, 1)
+    def get_widgets(self):
+        return [
+            Label(self.offset_x, self.offset_y, 30, 8, "Dir", 2),
+            ValueField(self.offset_x, self.offset_y + 8, 30, 8, self, "direction", font=3),
+        ]
 
-    def draw_values(self):
-        draw_text(str(self.direction), self.offset_x, self.offset_y + 8, 1)
+    def get_arrow(self):
+        return Arrow(self.offset_x, 17, 72 - self.offset_x, 23, self, "direction", self.offset_x + 13, 27)
 
 
 class NavSidebar(BaseCourseSidebar):
@@ -204,37 +148,41 @@ class NavSidebar(BaseCourseSidebar):
 
         self.distance = round(self.distance, 1)
 
-    def process_change(self, direction, wait_over):
-        if super().process_change(direction, wait_over):
+    def process_change(self, direction, repeated):
+        if super().process_change(direction, repeated):
             self.draw_distance = False
             return True
 
-        if direction == Direction.UP or (wait_over and input_up(False)):
+        if direction == Direction.UP or repeated == Direction.UP:
             self.draw_distance = True
             self.distance += 0.1
             if self.distance > 8:
                 self.distance = 0.0
             return True
 
-        elif direction == Direction.DOWN or (wait_over and input_down(False)):
+        elif direction == Direction.DOWN or repeated == Direction.DOWN:
             self.draw_distance = True
             self.distance -= 0.1
             if self.distance < 0:
                 self.distance = 8.0
             return True
 
-    def draw_labels(self):
-        super().draw_labels()
-        if self.draw_distance:
-            draw_text("Dist", self.offset_x, self.offset_y + 19, 1)
+    def get_widgets(self):
+        widgets = super().get_widgets()
+        self.arrow = self.get_arrow()
+        self.distance_widgets = [
+            Label(self.offset_x, self.offset_y + 19, 30, 8, "Dist", 2),
+            ValueField(self.offset_x, self.offset_y + 27, 30, 8, self, "distance", font=3),
+        ]
+        widgets.append(self.arrow)
+        widgets.extend(self.distance_widgets)
+        return widgets
 
-    def draw_values(self):
-        super().draw_values()
-        if self.draw_distance:
-            draw_text(str(self.distance), self.offset_x, self.offset_y + 27, 1)
-        else:
-            angle = direction_to_angle(self.direction)
-            draw_arrow(self.offset_x + 13, 27, 20, angle, 30, 4)
+    def draw(self):
+        self.arrow.set_visible(not self.draw_distance)
+        for widget in self.distance_widgets:
+            widget.set_visible(self.draw_distance)
+        super().draw()
 
 
 class TorpedoSidebar(BaseCourseSidebar):
@@ -246,10 +194,10 @@ class TorpedoSidebar(BaseCourseSidebar):
         global_store.game_state.last_torpedo_course = self.direction
         global_store.game_state.launch_torpedo(self.direction)
 
-    def draw(self):
-        super().draw()
-        angle = direction_to_angle(self.direction)
-        draw_arrow(self.offset_x + 13, 27, 20, angle, 30, 4)
+    def get_widgets(self):
+        widgets = super().get_widgets()
+        widgets.append(self.get_arrow())
+        return widgets
 
 
 class MainSidebar(BaseSidebar):
@@ -267,6 +215,18 @@ class MainSidebar(BaseSidebar):
         super().__init__(*args, **kwargs)
         self.cursor = 0
 
+    def get_widgets(self):
+        gs = global_store.game_state
+        self.menu_grid = Grid(self.offset_x, self.offset_y, 2, 3)
+        self.menu_grid.set_cells([line for lines in self.menu for line in lines])
+        return [
+            self.menu_grid,
+            ValueField(self.offset_x, self.status_y, 30, 6, gs, "player_energy", "E: {:>4}"),
+            ValueField(self.offset_x, self.status_y + 6, 30, 6, gs, "player_shield", "S: {:>4}"),
+            ValueField(self.offset_x, self.status_y + 12, 16, 6, gs, "player_torpedoes", "T{:>2}"),
+            ValueField(self.offset_x + 16, self.status_y + 12, 14, 6, gs, "time_remaining", "D{:>2}"),
+        ]
+
     def process(self):
         from ui.screens import LRSScreen, ComputerScreen
         if input_up():
@@ -326,35 +286,13 @@ class MainSidebar(BaseSidebar):
         elif input_a():
             return
 
-    def draw_menu(self):
-        thumby.display.drawFilledRectangle(
-            self.offset_x + 15 * (self.cursor // 3),
-            self.offset_y + (self.cursor % 3) * 6,
-            13, 6, 1
-        )
-        damaged = global_store.game_state.has_damage()
-        for column, lines in enumerate(self.menu):
-            for row, line in enumerate(lines):
-                draw_text(
-                    line,
-                    self.offset_x + 1 + column * 15,
-                    self.offset_y + row * 6,
-                    0 if (3 * column + row) == self.cursor else 1
-                )
-                if damaged and line in self.damage_mapping and getattr(global_store.game_state, self.damage_mapping[line]):
-                    thumby.display.drawFilledRectangle(
-                        self.offset_x + 15 * column,
-                        self.offset_y + 2 + row * 6,
-                        13, 2, 0
-                    )
-
-    def draw_status(self):
-        draw_text("E: {:>4}".format(global_store.game_state.player_energy), self.offset_x, self.status_y, 1)
-        draw_text("S: {:>4}".format(global_store.game_state.player_shield), self.offset_x, self.status_y + 6, 1)
-        draw_text("T{:>2}".format(global_store.game_state.player_torpedoes), self.offset_x, self.status_y + 12, 1)
-        draw_text("D{:>2}".format(global_store.game_state.time_remaining), self.offset_x + 16, self.status_y + 12, 1)
+    def update_menu(self):
+        gs = global_store.game_state
+        self.menu_grid.set_cursor(self.cursor)
+        for index, line in enumerate(self.menu_grid.cells):
+            if line in self.damage_mapping:
+                self.menu_grid.set_mark(index, getattr(gs, self.damage_mapping[line]))
 
     def draw(self):
-        self.fill_background()
-        self.draw_menu()
-        self.draw_status()
+        self.update_menu()
+        super().draw()
@@ -0,0 +1,201 @@
+import thumby
+
+from tables import Tables, course_index
+from utils import *
+
+
+def draw_widgets(widgets):
+    for widget in widgets:
+        if not widget.visible:
+            widget.draw()
+    for widget in widgets:
+        if widget.visible:
+            widget.draw()
+
+
+def invalidate_widgets(widgets):
+    for widget in widgets:
+        widget.invalidate()
+
+
+class Widget:
+    def __init__(self, x, y, width, height, font=1):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.font = font
+        self.visible = True
+        self.dirty = True
+
+    def invalidate(self):
+        self.dirty = True
+
+    def set_visible(self, visible):
+        if visible != self.visible:
+            self.visible = visible
+            self.dirty = True
+
+    def update(self):
+        pass
+
+    def clear(self):
+        thumby.display.drawFilledRectangle(self.x, self.y, self.width, self.height, 0)
+
+    def paint(self):
+        raise NotImplementedError
+
+    def draw(self):
+        if self.visible:
+            self.update()
+        if not self.dirty:
+            return False
+
+        self.dirty = False
+        self.clear()
+        if self.visible:
+            set_font(self.font)
+            self.paint()
+        return True
+
+
+class Label(Widget):
+    def __init__(self, x, y, width, height, text="", font=1, color=1):
+        super().__init__(x, y, width, height, font)
+        self.text = text
+        self.color = color
+
+    def set_text(self, text):
+        if text != self.text:
+            self.text = text
+            self.dirty = True
+
+    def paint(self):
+        draw_text(self.text, self.x, self.y, self.color)
+
+
+class ValueField(Label):
+    def __init__(self, x, y, width, height, source, field, template="{}", font=1):
+        super().__init__(x, y, width, height, "", font)
+        self.source = source
+        self.field = field
+        self.template = template
+        self.value = None
+
+    def update(self):
+        value = getattr(self.source, self.field)
+        if value != self.value:
+            self.value = value
+            self.set_text(self.template.format(value))
+
+
+class Arrow(Widget):
+    def __init__(self, x, y, width, height, source, field, center_x, center_y, length=20, head_angle=30, head_length=4):
+        super().__init__(x, y, width, height)
+        self.source = source
+        self.field = field
+        self.center_x = center_x
+        self.center_y = center_y
+        self.length = length
+        self.head_angle = head_angle
+        self.head_length = head_length
+        self.value = None
+
+    def update(self):
+        value = getattr(self.source, self.field)
+        if value != self.value:
+            self.value = value
+            self.dirty = True
+
+    def paint(self):
+        x1, y1, x2, y2, x3, y3, x4, y4 = Tables.arrow(
+            course_index(self.value), self.length, self.head_angle, self.head_length
+        )
+        x = self.center_x
+        y = self.center_y
+        thumby.display.drawLine(x + x1, y + y1, x + x2, y + y2, 1)
+        thumby.display.drawLine(x + x2, y + y2, x + x3, y + y3, 1)
+        thumby.display.drawLine(x + x2, y + y2, x + x4, y + y4, 1)
+
+
+class MenuList(Widget):
+    rows = 3
+    row_height = 10
+
+    def __init__(self, x, y, width, font=2):
+        super().__init__(x, y, width, self.rows * self.row_height, font)
+        self.items = []
+        self.offsets = []
+        self.cursor = 0
+
+    def set_items(self, items):
+        self.items = items
+        self.offsets = [self.x + (self.width - len(line) * 6) // 2 for line in items]
+        self.dirty = True
+
+    def set_cursor(self, cursor):
+        if cursor != self.cursor:
+            self.cursor = cursor
+            self.dirty = True
+
+    def paint(self):
+        start_index = max(0, min(self.cursor - 1, len(self.items) - self.rows))
+        thumby.display.drawFilledRectangle(
+            self.x,
+            self.y + (self.cursor - start_index) * self.row_height,
+            self.width,
+            self.row_height,
+            1
+        )
+        for idx in range(start_index, min(start_index + self.rows, len(self.items))):
+            draw_text(
+                self.items[idx],
+                self.offsets[idx],
+                self.y + 1 + (idx - start_index) * self.row_height,
+                0 if idx == self.cursor else 1
+            )
+
+
+class Grid(Widget):
+    def __init__(self, x, y, columns, rows, pitch_x=15, pitch_y=6, highlight_height=None, text_y=0, font=1):
+        self.columns = columns
+        self.rows = rows
+        self.pitch_x = pitch_x
+        self.pitch_y = pitch_y
+        self.highlight_width = pitch_x - 2
+        self.highlight_height = highlight_height or pitch_y
+        self.text_y = text_y
+        super().__init__(x, y, columns * pitch_x, rows * pitch_y + self.highlight_height - pitch_y, font)
+        self.cells = [""] * (columns * rows)
+        self.marks = bytearray(columns * rows)
+        self.cursor = -1
+
+    def set_cells(self, cells):
+        self.cells = cells
+        self.dirty = True
+
+    def set_cursor(self, cursor):
+        if cursor != self.cursor:
+            self.cursor = cursor
+            self.dirty = True
+
+    def set_mark(self, index, marked):
+        marked = int(bool(marked))
+        if self.marks[index] != marked:
+            self.marks[index] = marked
+            self.dirty = True
+
+    def paint(self):
+        if self.cursor >= 0:
+            thumby.display.drawFilledRectangle(
+                self.x + (self.cursor // self.rows) * self.pitch_x,
+                self.y + (self.cursor % self.rows) * self.pitch_y,
+                self.highlight_width, self.highlight_height, 1
+            )
+
+        for index, text in enumerate(self.cells):
+            x = self.x + (index // self.rows) * self.pitch_x
+            y = self.y + (index % self.rows) * self.pitch_y
+            draw_text(text, x + 1, y + self.text_y, 0 if index == self.cursor else 1)
+            if self.marks[index]:
+                thumby.display.drawFilledRectangle(x, y + 2, self.highlight_width, 2, 0)
@@ -2,22 +2,126 @@ import math
 import thumby
 
 from constants import Direction
+from systems import Input
 
-draw_text = thumby.display.drawText
 draw_sprite = thumby.display.drawSprite
+font_size = None
+font_cache = {}
+
+FONTS = {
+    1: ("/lib/font3x5.bin", 3, 5, 1),
+    2: ("/lib/font5x7.bin", 5, 7, 1),
+    3: ("/lib/font8x8.bin", 8, 8, 1),
+}
 
 
 def blit(bitmap, x, y):
     thumby.display.blit(bitmap, x * 5, y * 5, 5, 5, -1, 0, 0)
 
 
+def compose_cell(buffer, bitmap, x, y, width=40):
+    y *= 5
+    offset = (y >> 3) * width + x * 5
+    shift = y & 7
+    keep = ~(0x1F << shift)
+    for i in range(5):
+        value = bitmap[i] << shift
+        buffer[offset + i] = (buffer[offset + i] & keep | value) & 0xFF
+        if shift > 3:
+            buffer[offset + width + i] = (buffer[offset + width + i] & (keep >> 8) | (value >> 8)) & 0xFF
+
+
+def load_font(size):
+    try:
+        with open(FONTS[size][0], "rb") as fh:
+            font_cache[size] = bytearray(fh.read())
+    except OSError:
+        font_cache[size] = None
+
+
 def set_font(size):
-    if size == 1:
-        thumby.display.setFont("/lib/font3x5.bin", 3, 5, 1)
-    elif size == 2:
-        thumby.display.setFont("/lib/font5x7.bin", 5, 7, 1)
-    else:
-        thumby.display.setFont("/lib/font8x8.bin", 8, 8, 1)
+    global font_size
+    if size not in FONTS:
+        size = 3
+    if size == font_size:
+        return
+
+    if size not in font_cache:
+        load_font(size)
+    if font_cache[size] is None:
+        path, width, height, space = FONTS[size]
+        thumby.display.setFont(path, width, height, space)
+    font_size = size
+
+
+class TextCache:
+    size = 32
+    bitmaps = {}
+    order = []
+
+    @classmethod
+    def clear(cls):
+        cls.bitmaps.clear()
+        del cls.order[:]
+
+    @classmethod
+    def render(cls, text, color):
+        font = font_cache[font_size]
+        _, width, _, space = FONTS[font_size]
+        advance = width + space
+        glyphs = len(font) // width
+        bitmap = bytearray(len(text) * advance)
+        if not color:
+            for i in range(len(bitmap)):
+                bitmap[i] = 0xFF
+
+        x = 0
+        for char in text:
+            code = ord(char) - 0x20
+            if 0 <= code < glyphs:
+                offset = code * width
+                for column in range(width):
+                    if color:
+                        bitmap[x + column] = font[offset + column]
+                    else:
+                        bitmap[x + column] = font[offset + column] ^ 0xFF
+            x += advance
+        return bitmap
+
+    @classmethod
+    def get(cls, text, color):
+        key = (text, font_size, color)
+        bitmap = cls.bitmaps.get(key)
+        if bitmap is None:
+            bitmap = cls.render(text, color)
+            if len(cls.order) >= cls.size:
+                del cls.bitmaps[cls.order.pop(0)]
+            cls.bitmaps[key] = bitmap
+            cls.order.append(key)
+        elif cls.order[-1] != key:
+            cls.order.remove(key)
+            cls.order.append(key)
+        return bitmap
+
+    @classmethod
+    def draw(cls, text, x, y, color):
+        if not text:
+            return
+        if font_cache.get(font_size) is None:
+            thumby.display.drawText(text, x, y, color)
+            return
+
+        bitmap = cls.get(text, color)
+        thumby.display.blit(bitmap, x, y, len(bitmap), FONTS[font_size][2], 0 if color else 1, 0, 0)
+
+
+def draw_text(text, x, y, color):
+    TextCache.draw(text, x, y, color)
+
+
+def draw_lines(lines, color=1):
+    for idx in range(0, len(lines), 4):
+        thumby.display.drawLine(lines[idx], lines[idx + 1], lines[idx + 2], lines[idx + 3], color)
 
 
 def draw_arrow(arrow_center_x, arrow_center_y, arrow_length, angle_radians, head_angle=30, head_length=10):
@@ -54,52 +158,60 @@ def draw_arrow(arrow_center_x, arrow_center_y, arrow_length, angle_radians, head
 
 def input_left(just=True):
     if just:
-        return thumby.buttonL.justPressed()
-    return thumby.buttonL.pressed()
+        return bool(Input.pressed & Input.LEFT)
+    return bool(Input.state & Input.LEFT)
 
 
 def input_right(just=True):
     if just:
-        return thumby.buttonR.justPressed()
-    return thumby.buttonR.pressed()
+        return bool(Input.pressed & Input.RIGHT)
+    return bool(Input.state & Input.RIGHT)
 
 
 def input_up(just=True):
     if just:
-        return thumby.buttonU.justPressed()
-    return thumby.buttonU.pressed()
+        return bool(Input.pressed & Input.UP)
+    return bool(Input.state & Input.UP)
 
 
 def input_down(just=True):
     if just:
-        return thumby.buttonD.justPressed()
-    return thumby.buttonD.pressed()
+        return bool(Input.pressed & Input.DOWN)
+    return bool(Input.state & Input.DOWN)
 
 
 def input_a(just=True):
     if just:
-        return thumby.buttonA.justPressed()
-    return thumby.buttonA.pressed()
+        return bool(Input.pressed & Input.A)
+    return bool(Input.state & Input.A)
 
 
 def input_b(just=True):
     if just:
-        return thumby.buttonB.justPressed()
-    return thumby.buttonB.pressed()
+        return bool(Input.pressed & Input.B)
+    return bool(Input.state & Input.B)
 
 
-def input_dpad_just_pressed():
-    if thumby.buttonR.justPressed():
+def dpad_direction(mask):
+    if mask & Input.RIGHT:
         return Direction.RIGHT
-    if thumby.buttonD.justPressed():
+    if mask & Input.DOWN:
         return Direction.DOWN
-    if thumby.buttonL.justPressed():
+    if mask & Input.LEFT:
         return Direction.LEFT
-    if thumby.buttonU.justPressed():
+    if mask & Input.UP:
         return Direction.UP
     return Direction.NONE
 
 
+def input_dpad_just_pressed():
+    return dpad_direction(Input.pressed)
+
+
+def input_dpad_repeated():
+    return dpad_direction(Input.repeated)
+
+
 def distance(x1, y1, x2, y2):
     x = x2 - x1
     y = y2 - y1